@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import CLACheck
+
+
+@admin.register(CLACheck)
+class CLACheckAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "head_sha", "status", "result", "attempts", "created_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ["repository", "head_sha"]
+    ordering = ["-created_at"]
+    readonly_fields = ("created_at", "started_at", "finished_at")
@@ -1,11 +1,31 @@
 import logging
 import re
+from collections.abc import Iterable
+from collections.abc import Iterator
+from collections.abc import Mapping
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from itertools import islice
+from typing import Any
+from urllib.parse import parse_qs
 from urllib.parse import quote
+from urllib.parse import urlparse
 
 import requests
 from django.conf import settings
-from django.http import HttpResponse
+from django.db import transaction
+from django.utils import timezone
 
+from . import github
+from .models import CLACheck
+from .models import CommitVerdict
+from .models import MissingCLA
+from .models import PullRequestState
+from base.common import normalize_email
+from base.routers import pin_to_primary
+from base.routers import replica_reads
+from cla.models import DataVersion
 from cla.models import ICLA
 
 logger = logging.getLogger(__name__)
@@ -15,80 +35,351 @@ CLA_LABEL = "hold: cla required"
 TRIVIAL = re.compile(r"^\s*CLA\s*:\s*TRIVIAL", re.IGNORECASE | re.MULTILINE)
 SUCCESS = "success"
 FAILURE = "failure"
+# the largest page size GitHub allows for the PR commits endpoint
+COMMITS_PER_PAGE = 100
+# how many of the remaining pages are fetched in parallel
+COMMIT_PAGE_WORKERS = 4
+STATUS_CONTEXT = "cla-check"
+ISSUE_URL = re.compile(r"/repos/(?P<repository>[^/]+/[^/]+)/issues/(?P<number>\d+)$")
 
-
-def get_headers(token: str) -> dict[str, str]:
-    return {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {token}",
-        "X-GitHub-Api-Version": "2022-11-28",
+# the commits, and on the first page also the labels and the CLA check status of the head commit
+PULL_REQUEST_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $perPage: Int!, $cursor: String, $first: Boolean!,
+      $context: String!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      labels(first: 100) @include(if: $first) {
+        nodes { name }
+      }
+      head: commits(last: 1) @include(if: $first) {
+        nodes { commit { oid status { context(name: $context) { state description } } } }
+      }
+      commits(first: $perPage, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { commit { oid message author { email } } }
+      }
     }
+  }
+}
+"""
 
 
-def remove_label(pr: dict) -> None:
+def remove_label(pr: Mapping[str, Any]) -> None:
     url = f"{pr['issue_url']}/labels/{quote(CLA_LABEL)}"
     logger.info("Remove label %s", url)
-    r = requests.delete(url, headers=get_headers(settings.GITHUB_API_TOKEN))
+    r = github.delete(url, metric="remove_label", priority=github.Priority.LABEL)
     if r.status_code == 404:
         logger.info("Label %s doesn't exist", url)
+        return
+    r.raise_for_status()
 
 
-def add_label(pr: dict) -> None:
+def add_label(pr: Mapping[str, Any]) -> None:
     payload = f'[ "{CLA_LABEL}" ]'
     url = f"{pr['issue_url']}/labels"
     logger.info("Add label %s", url)
-    requests.post(url, data=payload, headers=get_headers(settings.GITHUB_API_TOKEN))
+    github.post(url, data=payload, metric="add_label", priority=github.Priority.LABEL).raise_for_status()
 
 
-def update_status(pr: dict, state: str, description: str) -> None:
+def update_status(pr: Mapping[str, Any], state: str, description: str) -> None:
     payload = {
         "state": state,
         "target_url": "https://openssl-library.org/policies/cla/",
         "description": description,
-        "context": "cla-check",
+        "context": STATUS_CONTEXT,
     }
     url = pr["_links"]["statuses"]["href"]
     logger.info("Update commit status of CLA check: %s, %s, %s", url, state, description)
-    requests.post(url, json=payload, headers=get_headers(settings.GITHUB_API_TOKEN))
+    github.post(url, json=payload, metric="update_status", priority=github.Priority.STATUS).raise_for_status()
+
+
+def get_cla_statuses(emails: Iterable[str]) -> dict[str, bool]:
+    """
+    Resolve the CLA status of every email with a single query, regardless of the case of the emails.
+    """
+    emails = set(emails)
+    if not emails:
+        return {}
+    keys = {normalize_email(email) for email in emails}
+    iclas: dict[str, bool] = {}
+    with replica_reads():
+        rows = list(ICLA.objects.filter(email_key__in=keys).values_list("email_key", "_is_active"))
+    for key, is_active in rows:
+        # the same address may have been registered in a different case, an active ICLA wins
+        iclas[key] = iclas.get(key, False) or is_active
+    result = {}
+    for email in emails:
+        if (is_active := iclas.get(normalize_email(email))) is not None:
+            logger.info("%s is found in the CLA DB, active - %s", email.lower(), is_active)
+            result[email] = is_active
+        else:
+            logger.info("%s is not found in the CLA DB", email.lower())
+            result[email] = False
+    return result
 
 
 def is_in_cla_db(email: str) -> bool:
-    try:
-        icla = ICLA.objects.get(email=email)
-        logger.info("%s is found in the CLA DB, active - %s", email.lower(), icla.is_active)
-        return icla.is_active
-    except ICLA.DoesNotExist:
-        logger.info("%s is not found in the CLA DB", email.lower())
-        return False
-
-
-def get_pr_commits(commits_url: str) -> dict:
-    headers = get_headers(settings.GITHUB_API_TOKEN)
-    r = requests.get(commits_url, headers=headers)
-    return r.json()
-
-
-def process(pr: dict) -> HttpResponse:
-    alltrivial = True
-    missing = set()
-    commits_url = pr["commits_url"]
-    items = get_pr_commits(commits_url)
-    for item in items:
-        email = item["commit"]["author"]["email"]
-        msg = item["commit"]["message"]
-        if not TRIVIAL.search(msg):
-            alltrivial = False
-            if not is_in_cla_db(email):
-                missing.add(email)
-    if alltrivial:
-        update_status(pr, SUCCESS, "Trivial")
+    return get_cla_statuses([email])[email]
+
+
+def get_commits_page(commits_url: str, page: int | None = None) -> requests.Response:
+    params = {"per_page": COMMITS_PER_PAGE}
+    if page is not None:
+        params["page"] = page
+    r = github.get(commits_url, params=params, metric="get_pr_commits")
+    r.raise_for_status()
+    return r
+
+
+def get_last_page(r: requests.Response) -> int:
+    if not (last := r.links.get("last")):
+        return 1
+    return int(parse_qs(urlparse(last["url"]).query).get("page", ["1"])[0])
+
+
+def get_pr_commits(commits_url: str) -> Iterator[dict]:
+    """
+    Yield the commits of a PR as they arrive.
+
+    The first page tells how many pages there are (the "last" relation of the Link header), the rest
+    of them are fetched concurrently and yielded in the order they complete.
+    """
+    r = get_commits_page(commits_url)
+    last_page = get_last_page(r)
+    if last_page == 1:
+        yield from r.json()
+        return
+    logger.info("Fetch %s pages of commits from %s", last_page, commits_url)
+    with ThreadPoolExecutor(max_workers=min(COMMIT_PAGE_WORKERS, last_page - 1)) as executor:
+        futures = [executor.submit(get_commits_page, commits_url, page) for page in range(2, last_page + 1)]
+        yield from r.json()
+        for future in as_completed(futures):
+            yield from future.result().json()
+
+
+def get_pull_request_key(pr: Mapping[str, Any]) -> tuple[str, int]:
+    """
+    Return the full name of the repository and the number of the PR.
+    """
+    match = ISSUE_URL.search(pr["issue_url"])
+    if match is None:
+        raise ValueError(f"Unexpected issue URL {pr['issue_url']}")
+    return match["repository"], int(match["number"])
+
+
+def query_pull_request_page(pr: Mapping[str, Any], cursor: str | None = None) -> dict:
+    repository, number = get_pull_request_key(pr)
+    owner, name = repository.split("/")
+    variables = {
+        "owner": owner,
+        "name": name,
+        "number": number,
+        "perPage": COMMITS_PER_PAGE,
+        "cursor": cursor,
+        "first": cursor is None,
+        "context": STATUS_CONTEXT,
+    }
+    r = github.post(
+        settings.GITHUB_GRAPHQL_URL,
+        json={"query": PULL_REQUEST_QUERY, "variables": variables},
+        metric="query_pull_request",
+    )
+    r.raise_for_status()
+    data = r.json()
+    if errors := data.get("errors"):
+        raise ValueError(f"GraphQL query of {repository}#{number} failed: {errors}")
+    return data["data"]["repository"]["pullRequest"]
+
+
+def iter_graphql_commits(pr: Mapping[str, Any], page: dict) -> Iterator[dict]:
+    """
+    Yield the commits of the page and of the pages after it in the shape of the REST API.
+    """
+    while True:
+        for node in page["commits"]["nodes"]:
+            commit = node["commit"]
+            email = (commit["author"] or {}).get("email") or ""
+            yield {"sha": commit["oid"], "commit": {"author": {"email": email}, "message": commit["message"]}}
+        if not page["commits"]["pageInfo"]["hasNextPage"]:
+            return
+        page = query_pull_request_page(pr, page["commits"]["pageInfo"]["endCursor"])
+
+
+def query_pull_request(pr: Mapping[str, Any]) -> tuple[Iterator[dict], Mapping[str, Any], tuple[str, str] | None]:
+    """
+    Fetch the commits, the labels and the current CLA check status of the PR with GraphQL.
+
+    Return the commits, the payload with the current labels, and the (state, description) of the
+    CLA check status of the head commit, if there is one.
+    """
+    page = query_pull_request_page(pr)
+    pr = {**pr, "labels": [{"name": node["name"]} for node in page["labels"]["nodes"]]}
+    status = None
+    head_sha = pr["_links"]["statuses"]["href"].rsplit("/", 1)[-1]
+    for node in page["head"]["nodes"]:
+        context = (node["commit"]["status"] or {}).get("context")
+        if node["commit"]["oid"] == head_sha and context:
+            status = (context["state"].lower(), context["description"])
+    return iter_graphql_commits(pr, page), pr, status
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def get_verdicts(commits: Iterable[dict]) -> list[CommitVerdict]:
+    """
+    Return the verdicts of the commits, reusing the cached ones.
+
+    Only the commits seen for the first time are parsed, and only their authors and the authors of
+    verdicts older than the current CLA data are looked up in the CLA DB.
+    """
+    cla_version = DataVersion.get(DataVersion.CLA)
+    verdicts = []
+    new = []
+    stale = []
+    with replica_reads():
+        if settings.DATABASE_REPLICAS and DataVersion.get(DataVersion.CLA) != cla_version:
+            # the replica lags behind the latest CLA changes, which a recheck must see
+            pin_to_primary()
+        for chunk in chunked(commits, COMMITS_PER_PAGE):
+            cached = CommitVerdict.objects.in_bulk([item["sha"] for item in chunk])
+            for item in chunk:
+                if (verdict := cached.get(item["sha"])) is None:
+                    verdict = CommitVerdict(
+                        sha=item["sha"],
+                        email=item["commit"]["author"]["email"],
+                        is_trivial=bool(TRIVIAL.search(item["commit"]["message"])),
+                    )
+                    new.append(verdict)
+                elif not verdict.is_trivial and verdict.cla_version != cla_version:
+                    stale.append(verdict)
+                verdicts.append(verdict)
+        statuses = get_cla_statuses(verdict.email for verdict in chain(new, stale) if not verdict.is_trivial)
+    now = timezone.now()
+    for verdict in chain(new, stale):
+        verdict.has_cla = statuses.get(verdict.email, False)
+        verdict.cla_version = cla_version
+        verdict.checked_at = now
+    CommitVerdict.objects.bulk_create(new, ignore_conflicts=True)
+    CommitVerdict.objects.bulk_update(stale, ["has_cla", "cla_version", "checked_at"])
+    logger.info("%s commits: %s new, %s re-checked, the rest cached", len(verdicts), len(new), len(stale))
+    return verdicts
+
+
+def is_labeled(pr: Mapping[str, Any], state: PullRequestState | None) -> bool | None:
+    """
+    Tell whether the PR carries the CLA label, None if that is unknown.
+
+    The labels of the webhook payload and the last published state are both consulted, as either can
+    be stale: a redelivered or queued payload predates later label changes, and the label can be edited
+    by hand. When they disagree the label is unknown, so it is written again.
+    """
+    sources = set()
+    if "labels" in pr:
+        sources.add(any(label["name"] == CLA_LABEL for label in pr["labels"]))
+    if state is not None:
+        sources.add(state.labeled)
+    return sources.pop() if len(sources) == 1 else None
+
+
+def with_label(pr: Mapping[str, Any], label: bool) -> Mapping[str, Any]:
+    """
+    Return the payload with its labels as they are after the label has been set or removed.
+    """
+    if "labels" not in pr:
+        return pr
+    labels = [item for item in pr["labels"] if item["name"] != CLA_LABEL]
+    if label:
+        labels.append({"name": CLA_LABEL})
+    return {**pr, "labels": labels}
+
+
+def is_running(check: CLACheck, lock: bool = False) -> bool:
+    """
+    Tell whether the queued check is still running, i.e. it has not been cancelled by a closed PR.
+    """
+    checks = CLACheck.objects.select_for_update() if lock else CLACheck.objects
+    return checks.filter(pk=check.pk, status=CLACheck.Status.RUNNING).values_list("pk").first() is not None
+
+
+def publish(
+    pr: Mapping[str, Any],
+    state: str,
+    description: str,
+    label: bool,
+    missing: set[str],
+    current_status: tuple[str, str] | None = None,
+    check: CLACheck | None = None,
+) -> None:
+    """
+    Set the commit status and the label, skipping the writes that would not change anything.
+
+    The current status of the head commit is compared when known, the last published one otherwise.
+    The emails the PR is waiting for are recorded, so the PR is checked again when one of their
+    CLAs becomes active. Nothing is written for a queued check that has been cancelled meanwhile,
+    as its PR was closed.
+    """
+    if check is not None and not is_running(check):
+        logger.info("CLA check %s was cancelled while it ran, nothing is published", check.pk)
+        return
+    statuses_url = pr["_links"]["statuses"]["href"]
+    published = PullRequestState.objects.filter(issue_url=pr["issue_url"]).first()
+    if current_status is None and published and published.statuses_url == statuses_url:
+        current_status = (published.state, published.description)
+    if current_status == (state, description):
+        logger.info("Commit status of CLA check is up to date: %s", statuses_url)
+    else:
+        update_status(pr, state, description)
+    labeled = is_labeled(pr, published)
+    if label and labeled is not True:
+        add_label(pr)
+    elif not label and labeled is not False:
         remove_label(pr)
-        return HttpResponse("Trivial")
+    with transaction.atomic():
+        # the check is locked, so a closing PR either waits for these writes or is seen here
+        if check is not None and not is_running(check, lock=True):
+            logger.info("CLA check %s was cancelled while it ran, its state is not recorded", check.pk)
+            return
+        published, _ = PullRequestState.objects.update_or_create(
+            issue_url=pr["issue_url"],
+            defaults={
+                "statuses_url": statuses_url,
+                "state": state,
+                "description": description,
+                "labeled": label,
+                "pull_request": with_label(pr, label),
+            },
+        )
+        missing = {normalize_email(email) for email in missing}
+        published.missing_clas.exclude(email__in=missing).delete()
+        MissingCLA.objects.bulk_create(
+            [MissingCLA(pull_request=published, email=email) for email in missing], ignore_conflicts=True
+        )
+
+
+def forget(pr: Mapping[str, Any]) -> None:
+    """
+    Stop waiting for the missing CLAs of a closed PR.
+    """
+    MissingCLA.objects.filter(pull_request__issue_url=pr["issue_url"]).delete()
+
+
+def process(pr: Mapping[str, Any], check: CLACheck | None = None) -> str:
+    if settings.GITHUB_USE_GRAPHQL:
+        commits, pr, current_status = query_pull_request(pr)
+    else:
+        commits, current_status = get_pr_commits(pr["commits_url"]), None
+    verdicts = [verdict for verdict in get_verdicts(commits) if not verdict.is_trivial]
+    missing = {verdict.email for verdict in verdicts if not verdict.has_cla}
+    if not verdicts:
+        publish(pr, SUCCESS, "Trivial", False, missing, current_status, check)
+        return "Trivial"
     elif not missing:
-        update_status(pr, SUCCESS, "CLA found")
-        remove_label(pr)
-        return HttpResponse("CLA found")
+        publish(pr, SUCCESS, "CLA found", False, missing, current_status, check)
+        return "CLA found"
     else:
-        update_status(pr, FAILURE, f"CLA missing: {', '.join(missing)}")
-        add_label(pr)
-        return HttpResponse("CLA missing")
+        publish(pr, FAILURE, f"CLA missing: {', '.join(sorted(missing))}", True, missing, current_status, check)
+        return "CLA missing"
@@ -0,0 +1,246 @@
+"""A shared GitHub API client, rate limited per resource and retried with backoff."""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from enum import IntEnum
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from base import metrics
+
+logger = logging.getLogger(__name__)
+
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_session: requests.Session | None = None
+_session_pid: int | None = None
+_session_lock = threading.Lock()
+_rate_limiters: dict[str, "RateLimiter"] = {}
+_rate_limiters_pid: int | None = None
+
+# the rate limit resources of GitHub, each with its own budget
+CORE = "core"
+GRAPHQL = "graphql"
+
+
+class Priority(IntEnum):
+    STATUS = 0
+    READ = 1
+    LABEL = 2
+
+
+class RateLimitBackpressure(Exception):
+    """
+    Too many GitHub calls are waiting for the rate limit, the caller should try again later.
+    """
+
+
+class RateLimiter:
+    """
+    A token bucket shared by the threads of a process, one for each rate limit resource of GitHub.
+
+    Tokens are refilled at `rate` per second up to `burst`, but never beyond the remaining budget
+    GitHub reports. When the budget is exhausted or GitHub asks to back off, every call waits until
+    the reset. Waiting calls are served in the order of their priority.
+    """
+
+    def __init__(self, rate: float, burst: int, max_queue: int, timeout: float, resource: str = CORE):
+        self.resource = resource
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.remaining: int | None = None
+        self.reset_at = 0.0
+        self.condition = threading.Condition()
+        self.waiting: list[tuple[int, int]] = []
+        self.sequence = itertools.count()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        if self.remaining is not None and now >= self.reset_at:
+            # a new rate limit window has started, its budget is known with the next response
+            self.remaining = None
+        if self.remaining is not None:
+            self.tokens = min(self.tokens, self.remaining)
+        self.updated = now
+
+    def _report(self) -> None:
+        metrics.set_gauge(f"github.scheduler.{self.resource}.queue_depth", len(self.waiting))
+        if self.remaining is not None:
+            metrics.set_gauge(f"github.rate_limit.{self.resource}.remaining", self.remaining)
+
+    def acquire(self, priority: Priority) -> None:
+        with self.condition:
+            if len(self.waiting) >= self.max_queue:
+                metrics.incr("github.scheduler.rejected")
+                raise RateLimitBackpressure(f"{len(self.waiting)} GitHub calls are already waiting")
+            entry = (priority, next(self.sequence))
+            heapq.heappush(self.waiting, entry)
+            self._report()
+            deadline = time.monotonic() + self.timeout
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self.waiting[0] == entry:
+                        if self.paused_until <= now and self.tokens >= 1:
+                            self.tokens -= 1
+                            if self.remaining is not None:
+                                self.remaining -= 1
+                            return
+                        delay = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+                    else:
+                        # woken up when the calls ahead are served
+                        delay = deadline - now
+                    if now >= deadline:
+                        metrics.incr("github.scheduler.timeouts")
+                        raise RateLimitBackpressure(f"Waited {self.timeout} seconds for the GitHub rate limit")
+                    self.condition.wait(min(delay, deadline - now))
+            finally:
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+                self._report()
+                self.condition.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.condition.notify_all()
+
+    def update(self, r: requests.Response) -> None:
+        """
+        Follow the rate limit headers of a response.
+        """
+        if (remaining := r.headers.get("X-RateLimit-Remaining")) is None:
+            return
+        with self.condition:
+            self.remaining = int(remaining)
+            reset = r.headers.get("X-RateLimit-Reset")
+            wait = max(0.0, int(reset) - time.time()) if reset else 0.0
+            self.reset_at = time.monotonic() + wait
+            if self.remaining == 0:
+                self.paused_until = max(self.paused_until, self.reset_at)
+                logger.warning("GitHub %s rate limit is exhausted, the calls wait %.0f seconds", self.resource, wait)
+            self._report()
+            self.condition.notify_all()
+
+
+def get_headers(token: str) -> dict[str, str]:
+    return {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {token}",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+
+
+def get_session() -> requests.Session:
+    """
+    Return the session of the current process, a forked worker gets a fresh one.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.GITHUB_API_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def get_rate_limiter(resource: str = CORE) -> RateLimiter:
+    """
+    Return the rate limiter of the resource for the current process, a forked worker gets fresh ones.
+    """
+    global _rate_limiters, _rate_limiters_pid
+    with _session_lock:
+        if _rate_limiters_pid != os.getpid():
+            _rate_limiters, _rate_limiters_pid = {}, os.getpid()
+        if resource not in _rate_limiters:
+            _rate_limiters[resource] = RateLimiter(
+                rate=settings.GITHUB_API_RATE,
+                burst=settings.GITHUB_API_BURST,
+                max_queue=settings.GITHUB_API_MAX_QUEUE,
+                timeout=settings.GITHUB_API_QUEUE_TIMEOUT,
+                resource=resource,
+            )
+        return _rate_limiters[resource]
+
+
+def get_resource(url: str) -> str:
+    return GRAPHQL if url == settings.GITHUB_GRAPHQL_URL else CORE
+
+
+def is_rate_limited(r: requests.Response) -> bool:
+    if r.status_code not in (403, 429):
+        return False
+    return "Retry-After" in r.headers or r.headers.get("X-RateLimit-Remaining") == "0"
+
+
+def get_retry_delay(r: requests.Response | None, attempt: int) -> float:
+    if r is not None:
+        if retry_after := r.headers.get("Retry-After"):
+            return float(retry_after)
+        if r.headers.get("X-RateLimit-Remaining") == "0" and (reset := r.headers.get("X-RateLimit-Reset")):
+            return max(0.0, int(reset) - time.time())
+    return settings.GITHUB_API_BACKOFF_FACTOR * 2**attempt
+
+
+def request(method: str, url: str, *, metric: str, priority: Priority = Priority.READ, **kwargs) -> requests.Response:
+    kwargs["headers"] = get_headers(settings.GITHUB_API_TOKEN) | kwargs.get("headers", {})
+    kwargs.setdefault("timeout", (settings.GITHUB_API_CONNECT_TIMEOUT, settings.GITHUB_API_READ_TIMEOUT))
+    limiter = get_rate_limiter(get_resource(url))
+    attempt = 0
+    while True:
+        limiter.acquire(priority)
+        r = None
+        start = time.monotonic()
+        try:
+            r = get_session().request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            metrics.incr(f"github.{metric}.errors")
+            if attempt >= settings.GITHUB_API_MAX_RETRIES:
+                raise
+        else:
+            # the budget the response reports is the one of the resource GitHub counted the call against
+            get_rate_limiter(r.headers.get("X-RateLimit-Resource", limiter.resource)).update(r)
+            if r.status_code not in RETRY_STATUSES and not is_rate_limited(r):
+                return r
+            metrics.incr(f"github.{metric}.errors")
+            if attempt >= settings.GITHUB_API_MAX_RETRIES:
+                return r
+        finally:
+            metrics.observe(f"github.{metric}", time.monotonic() - start)
+        delay = min(get_retry_delay(r, attempt), settings.GITHUB_API_MAX_RETRY_DELAY)
+        reason = r.status_code if r is not None else "connection error"
+        logger.warning("Retry %s %s in %.1f seconds after %s", method, url, delay, reason)
+        metrics.incr(f"github.{metric}.retries")
+        if r is not None and is_rate_limited(r):
+            # every call of the process has to hold back, not only this one
+            limiter.pause(delay)
+        else:
+            time.sleep(delay)
+        attempt += 1
+
+
+def get(url: str, *, metric: str, **kwargs) -> requests.Response:
+    return request("GET", url, metric=metric, **kwargs)
+
+
+def post(url: str, *, metric: str, **kwargs) -> requests.Response:
+    return request("POST", url, metric=metric, **kwargs)
+
+
+def delete(url: str, *, metric: str, **kwargs) -> requests.Response:
+    return request("DELETE", url, metric=metric, **kwargs)
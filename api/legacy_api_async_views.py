@@ -0,0 +1,136 @@
+"""The async variants of the legacy API views, served when ASYNC_VIEWS is enabled."""
+
+from asgiref.sync import sync_to_async
+from django.db.models import aprefetch_related_objects
+from django.http import HttpRequest
+from django.http import HttpResponse
+from django.http import HttpResponseBadRequest
+from django.http import JsonResponse
+
+from .legacy_api_views import active_email_keys
+from .legacy_api_views import batch_view
+from .legacy_api_views import depends_on_group
+from .legacy_api_views import depends_on_person
+from .legacy_api_views import describe_emails
+from .legacy_api_views import describe_people
+from .legacy_api_views import email_iclas
+from .legacy_api_views import group_cla_emails
+from .legacy_api_views import legacy_view
+from .legacy_api_views import person_cla_emails
+from .legacy_api_views import person_details
+from .legacy_api_views import read_batch
+from .legacy_api_views import sorted_cla_emails
+from base.common import aiter_chunks
+from base.common import astreaming_json_response
+from cla.models import DataVersion
+from personnel.index import aresolve_person
+from personnel.models import Group
+from personnel.models import Person
+
+
+@legacy_view(DataVersion.PERSONNEL)
+async def list_people(request: HttpRequest) -> HttpResponse:
+    return astreaming_json_response(Person.alist_people())
+
+
+@legacy_view(DataVersion.PERSONNEL, dated=True)
+async def find_person(request: HttpRequest, id: str) -> HttpResponse:
+    person = await aresolve_person(id)
+    depends_on_person(request, person)
+    if person:
+        await Person.afetch_details([person])
+        return JsonResponse(person_details(person), safe=False)
+    return HttpResponse(status=204)
+
+
+@batch_view(DataVersion.PERSONNEL, dated=True)
+async def find_people(request: HttpRequest) -> HttpResponse:
+    try:
+        ids = read_batch(request, "id")
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    # a fixed number of queries, run together in a single thread
+    return JsonResponse(describe_people(await sync_to_async(Person.find_many)(ids)))
+
+
+@legacy_view(DataVersion.PERSONNEL, dated=True)
+async def get_person_membership(request: HttpRequest, id: str) -> HttpResponse:
+    person = await aresolve_person(id)
+    depends_on_person(request, person)
+    if person:
+        await aprefetch_related_objects([person], Person.membership_prefetch())
+        return JsonResponse(person.memberof, safe=False)
+    return HttpResponse(status=204)
+
+
+@legacy_view(DataVersion.PERSONNEL, dated=True)
+async def is_person_in_group(request: HttpRequest, id: str, group: str) -> HttpResponse:
+    person = await aresolve_person(id)
+    depends_on_person(request, person)
+    if person:
+        await aprefetch_related_objects([person], Person.membership_prefetch())
+        if group in person.memberof:
+            return JsonResponse([person.memberof[group]], safe=False)
+    return HttpResponse(status=204)
+
+
+@legacy_view(DataVersion.PERSONNEL)
+async def get_person_tag(request: HttpRequest, id: str, tag: str) -> HttpResponse:
+    person = await aresolve_person(id)
+    depends_on_person(request, person)
+    if person and tag in person.tags:
+        return JsonResponse([person.tags[tag]], safe=False)
+    return HttpResponse(status=204)
+
+
+@legacy_view(DataVersion.PERSONNEL, DataVersion.CLA)
+async def get_person_cla(request: HttpRequest, id: str) -> HttpResponse:
+    person = await aresolve_person(id)
+    depends_on_person(request, person)
+    if person:
+        return JsonResponse([email async for email in person_cla_emails(person)], safe=False)
+    return HttpResponse(status=204)
+
+
+@legacy_view(DataVersion.PERSONNEL, dated=True)
+async def get_group_members(request: HttpRequest, group: str) -> HttpResponse:
+    try:
+        g = await Group.objects.aget(name=group)
+    except (Group.DoesNotExist, Group.MultipleObjectsReturned):
+        depends_on_group(request, None)
+        return HttpResponse(status=204)
+    depends_on_group(request, g)
+    return JsonResponse([person.ids async for person in Person.with_ids(g.active_members)], safe=False)
+
+
+@legacy_view(DataVersion.PERSONNEL, DataVersion.CLA, dated=True)
+async def get_group_members_cla(request: HttpRequest, group: str) -> HttpResponse:
+    try:
+        g = await Group.objects.aget(name=group)
+    except (Group.DoesNotExist, Group.MultipleObjectsReturned):
+        depends_on_group(request, None)
+        return HttpResponse(status=204)
+    depends_on_group(request, g)
+    return JsonResponse([email async for email in group_cla_emails(g)], safe=False)
+
+
+@legacy_view(DataVersion.CLA)
+async def get_email_cla(request: HttpRequest, email: str) -> HttpResponse:
+    if await email_iclas(email).aexists():
+        return JsonResponse([1], safe=False)
+    return HttpResponse(status=204)
+
+
+@legacy_view(DataVersion.CLA)
+async def get_list_clas(request: HttpRequest) -> HttpResponse:
+    iclas = sorted_cla_emails()
+    return astreaming_json_response(row["sort_key"] async for chunk in aiter_chunks(iclas, "sort_key") for row in chunk)
+
+
+@batch_view(DataVersion.CLA)
+async def get_emails_cla(request: HttpRequest) -> HttpResponse:
+    try:
+        emails = read_batch(request, "email")
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    return JsonResponse(describe_emails(emails, {key async for key in active_email_keys(emails)}))
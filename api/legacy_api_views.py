@@ -1,89 +1,294 @@
+import functools
+import json
 import logging
+from collections.abc import Callable
+from inspect import iscoroutinefunction
+from typing import Any
 
+from django.conf import settings
+from django.db.models import QuerySet
 from django.http import HttpRequest
 from django.http import HttpResponse
+from django.http import HttpResponseBadRequest
 from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import etag
+from django.views.decorators.http import require_http_methods
 from django.views.decorators.http import require_safe
 
+from base import response_cache
+from base.common import binary_collate
+from base.common import iter_chunks
+from base.common import normalize_email
+from base.common import streaming_json_response
+from base.routers import read_from_replica
+from cla.models import DataVersion
 from cla.models import ICLA
+from personnel.index import resolve_person
 from personnel.models import Group
 from personnel.models import Person
 
 
 logger = logging.getLogger(__name__)
 
+SAFE_METHODS = ("GET", "HEAD")
 
-@require_safe
+
+def data_etag(*names: str, dated: bool = False) -> Callable:
+    """
+    Tag the responses of a view with the versions of the data it reads, and the date if it depends on
+    membership dates, so unchanged data is answered with 304 Not Modified before the view runs. Only the
+    safe methods are tagged, so the POST of a batch neither reads the versions nor fails a precondition.
+
+    The versions are kept on the request, so the response cache keys the body with the same snapshot
+    as its ETag.
+    """
+
+    def make_etag(request: HttpRequest, versions: list[int]) -> str:
+        request.data_versions = dict(zip(names, versions))
+        parts = [f"{name}.{version}" for name, version in zip(names, versions)]
+        if dated:
+            parts.append(timezone.now().date().isoformat())
+        return "-".join(parts)
+
+    def get_etag(request: HttpRequest, *args, **kwargs) -> str:
+        return make_etag(request, DataVersion.get_many(*names))
+
+    def decorator(view: Callable) -> Callable:
+        if not iscoroutinefunction(view):
+            conditional = etag(get_etag)(view)
+
+            @functools.wraps(view)
+            def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+                if request.method not in SAFE_METHODS:
+                    return view(request, *args, **kwargs)
+                return conditional(request, *args, **kwargs)
+
+            return wrapper
+        # etag() calls its function synchronously, the versions are read before
+        aconditional = etag(lambda request, *args, **kwargs: request.data_etag)(view)
+
+        @functools.wraps(view)
+        async def async_wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method not in SAFE_METHODS:
+                return await view(request, *args, **kwargs)
+            request.data_etag = make_etag(request, await DataVersion.aget_many(*names))
+            return await aconditional(request, *args, **kwargs)
+
+        return async_wrapper
+
+    return decorator
+
+
+def read_batch(request: HttpRequest, name: str) -> list[str]:
+    """
+    Read the items of a batch request: a JSON array in the body of a POST, or the repeated `name`
+    query parameter otherwise.
+    """
+    if request.method == "POST":
+        try:
+            items = json.loads(request.body)
+        except ValueError:
+            raise ValueError("The body is not valid JSON.")
+        if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+            raise ValueError("The body must be a JSON array of strings.")
+    else:
+        items = request.GET.getlist(name)
+    if len(items) > settings.LEGACY_API_BATCH_LIMIT:
+        raise ValueError(f"At most {settings.LEGACY_API_BATCH_LIMIT} items are allowed in a request.")
+    return list(dict.fromkeys(items))
+
+
+def legacy_view(*names: str, dated: bool = False) -> Callable:
+    """
+    Serve a read-only view of the legacy API from a replica, tagged and cached by the versions of the
+    named data.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        view = data_etag(*names, dated=dated)(response_cache.cached_response(*names)(view))
+        return require_safe(read_from_replica(view))
+
+    return decorator
+
+
+def batch_view(*names: str, dated: bool = False) -> Callable:
+    """
+    Serve a batch view of the legacy API, which takes its items in the query string or a POST body,
+    from a replica.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        view = read_from_replica(data_etag(*names, dated=dated)(view))
+        return require_http_methods(["GET", "HEAD", "POST"])(csrf_exempt(view))
+
+    return decorator
+
+
+def depends_on_person(request: HttpRequest, person: Person | None) -> None:
+    # which person the identifier resolves to, and the details of that person
+    names = [DataVersion.of_person(person.pk)] if person else []
+    response_cache.depends_on(request, DataVersion.IDENTIFIERS, *names)
+
+
+def depends_on_group(request: HttpRequest, group: Group | None) -> None:
+    # which group the name resolves to, and its members
+    names = [DataVersion.of_group(group.pk)] if group else []
+    response_cache.depends_on(request, DataVersion.GROUPS, *names)
+
+
+def person_details(person: Person) -> dict[str, Any]:
+    return {"ids": person.ids, "tags": person.tags, "memberof": person.memberof}
+
+
+def describe_people(found: dict[str, list[Person]]) -> dict[str, dict[str, Any]]:
+    """
+    Answer every identifier of a batch with the details of its person, or with an error telling
+    whether it is unknown or ambiguous.
+    """
+    result: dict[str, dict[str, Any]] = {}
+    for id, people in found.items():
+        if not people:
+            result[id] = {"error": "not found"}
+        elif len(people) > 1:
+            result[id] = {"error": "ambiguous"}
+        else:
+            result[id] = person_details(people[0])
+    return result
+
+
+def person_cla_emails(person: Person) -> QuerySet:
+    return person.iclas.filter(_is_active=True).values_list("email", flat=True)
+
+
+def group_cla_emails(group: Group) -> QuerySet:
+    return group.active_iclas.values_list("email", flat=True)
+
+
+def email_iclas(email: str) -> QuerySet[ICLA]:
+    return ICLA.objects.filter(email_key=normalize_email(email), _is_active=True)
+
+
+def sorted_cla_emails() -> QuerySet:
+    # ordered in SQL the way sorted() orders them in Python
+    return ICLA.objects.filter(_is_active=True).values(sort_key=binary_collate("email"))
+
+
+def active_email_keys(emails: list[str]) -> QuerySet:
+    keys = {normalize_email(email) for email in emails}
+    return ICLA.objects.filter(email_key__in=keys, _is_active=True).values_list("email_key", flat=True)
+
+
+def describe_emails(emails: list[str], active: set[str]) -> dict[str, bool]:
+    return {email: normalize_email(email) in active for email in emails}
+
+
+@legacy_view(DataVersion.PERSONNEL)
 def list_people(request: HttpRequest) -> HttpResponse:
-    return JsonResponse(Person.list_people(), safe=False)
+    return streaming_json_response(Person.list_people())
 
 
-@require_safe
+@legacy_view(DataVersion.PERSONNEL, dated=True)
 def find_person(request: HttpRequest, id: str) -> HttpResponse:
-    if person := Person.find(id):
-        return JsonResponse({"ids": person.ids, "tags": person.tags, "memberof": person.memberof}, safe=False)
+    person = resolve_person(id)
+    depends_on_person(request, person)
+    if person:
+        return JsonResponse(person_details(person), safe=False)
     return HttpResponse(status=204)
 
 
-@require_safe
+@batch_view(DataVersion.PERSONNEL, dated=True)
+def find_people(request: HttpRequest) -> HttpResponse:
+    """
+    Resolve many identifiers at once, each to the answer of /0/Person/<id> or to an error telling
+    whether it is unknown or ambiguous.
+    """
+    try:
+        ids = read_batch(request, "id")
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    return JsonResponse(describe_people(Person.find_many(ids)))
+
+
+@legacy_view(DataVersion.PERSONNEL, dated=True)
 def get_person_membership(request: HttpRequest, id: str) -> HttpResponse:
-    if person := Person.find(id):
+    person = resolve_person(id)
+    depends_on_person(request, person)
+    if person:
         return JsonResponse(person.memberof, safe=False)
     return HttpResponse(status=204)
 
 
-@require_safe
+@legacy_view(DataVersion.PERSONNEL, dated=True)
 def is_person_in_group(request: HttpRequest, id: str, group: str) -> HttpResponse:
-    if (person := Person.find(id)) and group in person.memberof:
+    person = resolve_person(id)
+    depends_on_person(request, person)
+    if person and group in person.memberof:
         return JsonResponse([person.memberof[group]], safe=False)
     return HttpResponse(status=204)
 
 
-@require_safe
+@legacy_view(DataVersion.PERSONNEL)
 def get_person_tag(request: HttpRequest, id: str, tag: str) -> HttpResponse:
-    if (person := Person.find(id)) and tag in person.tags:
+    person = resolve_person(id)
+    depends_on_person(request, person)
+    if person and tag in person.tags:
         return JsonResponse([person.tags[tag]], safe=False)
     return HttpResponse(status=204)
 
 
-@require_safe
+@legacy_view(DataVersion.PERSONNEL, DataVersion.CLA)
 def get_person_cla(request: HttpRequest, id: str) -> HttpResponse:
-    if person := Person.find(id):
-        return JsonResponse([icla.email for icla in person.iclas.all() if icla.is_active], safe=False)
+    person = resolve_person(id)
+    depends_on_person(request, person)
+    if person:
+        return JsonResponse(list(person_cla_emails(person)), safe=False)
     return HttpResponse(status=204)
 
 
-@require_safe
+@legacy_view(DataVersion.PERSONNEL, dated=True)
 def get_group_members(request: HttpRequest, group: str) -> HttpResponse:
     try:
         g = Group.objects.get(name=group)
-        members = [person.ids for person in g.active_members]
-        return JsonResponse(members, safe=False)
     except (Group.DoesNotExist, Group.MultipleObjectsReturned):
+        depends_on_group(request, None)
         return HttpResponse(status=204)
+    depends_on_group(request, g)
+    return JsonResponse([person.ids for person in Person.with_ids(g.active_members)], safe=False)
 
 
-@require_safe
+@legacy_view(DataVersion.PERSONNEL, DataVersion.CLA, dated=True)
 def get_group_members_cla(request: HttpRequest, group: str) -> HttpResponse:
     try:
         g = Group.objects.get(name=group)
-        return JsonResponse(g.icla_emails, safe=False)
     except (Group.DoesNotExist, Group.MultipleObjectsReturned):
+        depends_on_group(request, None)
         return HttpResponse(status=204)
+    depends_on_group(request, g)
+    return JsonResponse(list(group_cla_emails(g)), safe=False)
 
 
-@require_safe
+@legacy_view(DataVersion.CLA)
 def get_email_cla(request: HttpRequest, email: str) -> HttpResponse:
-    try:
-        icla = ICLA.objects.get(email=email)
-        if icla.is_active:
-            return JsonResponse([1], safe=False)
-    except ICLA.DoesNotExist:
-        pass
+    if email_iclas(email).exists():
+        return JsonResponse([1], safe=False)
     return HttpResponse(status=204)
 
 
-@require_safe
+@legacy_view(DataVersion.CLA)
 def get_list_clas(request: HttpRequest) -> HttpResponse:
-    iclas = [icla.email for icla in ICLA.objects.all() if icla.is_active]
-    return JsonResponse(sorted(iclas), safe=False)
+    iclas = sorted_cla_emails()
+    return streaming_json_response(row["sort_key"] for chunk in iter_chunks(iclas, "sort_key") for row in chunk)
+
+
+@batch_view(DataVersion.CLA)
+def get_emails_cla(request: HttpRequest) -> HttpResponse:
+    """
+    Tell for every email whether it has an active CLA, with a single query.
+    """
+    try:
+        emails = read_batch(request, "email")
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    return JsonResponse(describe_emails(emails, set(active_email_keys(emails))))
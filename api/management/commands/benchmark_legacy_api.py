@@ -0,0 +1,228 @@
+import asyncio
+import io
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from cla.models import ICLA
+from personnel.models import Group
+from personnel.models import Person
+
+
+def get_host() -> str:
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != "*" and not host.startswith(".")]
+    return hosts[0] if hosts else "localhost"
+
+
+def default_paths() -> list[str]:
+    # a sample of every kind of legacy API request, built from the data in the database
+    paths = [reverse("0-people"), reverse("0-clas")]
+    if person := Person.objects.order_by("pk").first():
+        paths.append(reverse("0-person-id", args=(person.name,)))
+        paths.append(reverse("0-person-id-membership", args=(person.name,)))
+    if group := Group.objects.order_by("pk").first():
+        paths.append(reverse("0-group-group-members", args=(group.name,)))
+    if email := ICLA.objects.filter(_is_active=True).values_list("email", flat=True).first():
+        paths.append(reverse("0-hascla-email", args=(email,)))
+    return paths
+
+
+def run_wsgi(paths: list[str], requests: int, concurrency: int) -> tuple[list[float], int]:
+    handler = WSGIHandler()
+    host = get_host()
+    todo = itertools.islice(itertools.cycle(paths), requests)
+    lock = threading.Lock()
+    durations = []
+    errors = 0
+
+    def call(path: str) -> int:
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "SERVER_NAME": host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": host,
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        statuses = []
+        result = handler(environ, lambda status, headers, exc_info=None: statuses.append(int(status.split()[0])))
+        try:
+            for _ in result:
+                pass
+        finally:
+            result.close()
+        return statuses[0]
+
+    def worker() -> None:
+        nonlocal errors
+        while True:
+            with lock:
+                path = next(todo, None)
+            if path is None:
+                return
+            start = time.perf_counter()
+            status = call(path)
+            with lock:
+                durations.append(time.perf_counter() - start)
+                errors += status >= 500
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return durations, errors
+
+
+def run_asgi(paths: list[str], requests: int, concurrency: int) -> tuple[list[float], int]:
+    handler = ASGIHandler()
+    host = get_host()
+    todo = itertools.islice(itertools.cycle(paths), requests)
+    durations = []
+    errors = 0
+
+    async def call(path: str) -> int:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", host.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": (host, 80),
+        }
+        received = False
+        statuses = []
+
+        async def receive() -> dict:
+            nonlocal received
+            if received:
+                # the client never disconnects, the handler stops waiting when the response is sent
+                await asyncio.Event().wait()
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        await handler(scope, receive, send)
+        return statuses[0]
+
+    async def worker() -> None:
+        nonlocal errors
+        for path in todo:
+            start = time.perf_counter()
+            status = await call(path)
+            durations.append(time.perf_counter() - start)
+            errors += status >= 500
+
+    async def main() -> None:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    asyncio.run(main())
+    return durations, errors
+
+
+SERVERS = {"wsgi": run_wsgi, "asgi": run_asgi}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the legacy API served by the WSGI handler with the sync views and by "
+        "the ASGI handler with the async views, on the data of the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Number of requests sent to every server.")
+        parser.add_argument("--concurrency", type=int, default=50, help="Number of requests in flight at once.")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Path requested in turn with the others, a sample of the legacy API by default.",
+        )
+        parser.add_argument(
+            "--server",
+            choices=SERVERS,
+            help="Benchmark only this server in the current process, ASYNC_VIEWS must match it.",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the result as JSON.")
+
+    def handle(self, *args, **options):
+        if options["server"]:
+            self.benchmark(options)
+        else:
+            self.compare(options)
+
+    def benchmark(self, options: dict) -> None:
+        server = options["server"]
+        if settings.ASYNC_VIEWS != (server == "asgi"):
+            raise CommandError(f"ASYNC_VIEWS must be {server == 'asgi'} to benchmark {server}.")
+        paths = options["paths"] or default_paths()
+        run = SERVERS[server]
+        # warm up the connections, the caches and the identity index
+        run(paths, len(paths), 1)
+        start = time.perf_counter()
+        durations, errors = run(paths, options["requests"], options["concurrency"])
+        elapsed = time.perf_counter() - start
+        quantiles = statistics.quantiles(durations, n=100) if len(durations) > 1 else durations * 99
+        result = {
+            "server": server,
+            "requests": len(durations),
+            "errors": errors,
+            "seconds": round(elapsed, 3),
+            "throughput": round(len(durations) / elapsed, 1),
+            "p50_ms": round(quantiles[49] * 1000, 2),
+            "p99_ms": round(quantiles[98] * 1000, 2),
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(result))
+        else:
+            self.stdout.write(self.format(result))
+
+    def compare(self, options: dict) -> None:
+        # the views are chosen when the URLs are loaded, so every server is run in its own process
+        results = {}
+        for server in SERVERS:
+            command = [sys.executable, "-m", "django", "benchmark_legacy_api", "--server", server, "--json"]
+            command += ["--requests", str(options["requests"]), "--concurrency", str(options["concurrency"])]
+            for path in options["paths"] or []:
+                command += ["--path", path]
+            env = os.environ | {"DJANGO_ASYNC_VIEWS": "true" if server == "asgi" else "false"}
+            output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+            results[server] = json.loads(output.strip().splitlines()[-1])
+            self.stdout.write(self.format(results[server]))
+        ratio = results["asgi"]["throughput"] / results["wsgi"]["throughput"]
+        self.stdout.write(f"ASGI serves {ratio:.2f} times the requests per second of WSGI")
+
+    def format(self, result: dict) -> str:
+        return (
+            f"{result['server']}: {result['requests']} requests in {result['seconds']} s, "
+            f"{result['throughput']} requests/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+            f"{result['errors']} errors"
+        )
@@ -0,0 +1,41 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.tasks import run_pending
+from api.tasks import run_worker
+
+
+class Command(BaseCommand):
+    help = "Run the queued CLA checks of GitHub pull requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.CLA_CHECK_WORKERS,
+            help="Number of checks run concurrently.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.CLA_CHECK_POLL_INTERVAL,
+            help="Seconds an idle worker waits before polling the queue again.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Run the checks that are due and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["burst"]:
+            count = run_pending()
+            self.stdout.write(f"Ran {count} CLA checks")
+            return
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+        run_worker(options["workers"], options["poll_interval"], stop)
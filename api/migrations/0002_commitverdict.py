@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommitVerdict',
+            fields=[
+                ('sha', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('email', models.CharField(max_length=255)),
+                ('is_trivial', models.BooleanField()),
+                ('has_cla', models.BooleanField(default=False)),
+                ('cla_version', models.PositiveBigIntegerField(default=0)),
+                ('checked_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
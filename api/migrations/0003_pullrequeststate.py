@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_commitverdict'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PullRequestState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('issue_url', models.CharField(max_length=500, unique=True)),
+                ('statuses_url', models.CharField(max_length=500)),
+                ('state', models.CharField(max_length=16)),
+                ('description', models.TextField()),
+                ('labeled', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
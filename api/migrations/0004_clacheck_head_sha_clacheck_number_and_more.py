@@ -0,0 +1,61 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:41
+
+import re
+
+from django.db import migrations, models
+
+ISSUE_URL = re.compile(r"/repos/(?P<repository>[^/]+/[^/]+)/issues/(?P<number>\d+)$")
+BATCH_SIZE = 1000
+
+
+def backfill_pull_request_key(apps, schema_editor):
+    # the checks queued before the upgrade are coalesced and superseded like the new ones
+    CLACheck = apps.get_model('api', 'CLACheck')
+    batch = []
+    for check in CLACheck.objects.filter(repository='').only('pull_request').iterator(chunk_size=BATCH_SIZE):
+        pr = check.pull_request or {}
+        match = ISSUE_URL.search(pr.get('issue_url', ''))
+        if match is None:
+            continue
+        check.repository, check.number = match['repository'], int(match['number'])
+        check.head_sha = pr.get('_links', {}).get('statuses', {}).get('href', '').rsplit('/', 1)[-1][:40]
+        batch.append(check)
+        if len(batch) == BATCH_SIZE:
+            CLACheck.objects.bulk_update(batch, ['repository', 'number', 'head_sha'])
+            batch = []
+    CLACheck.objects.bulk_update(batch, ['repository', 'number', 'head_sha'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_pullrequeststate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clacheck',
+            name='head_sha',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='clacheck',
+            name='number',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='clacheck',
+            name='repository',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='clacheck',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('superseded', 'Superseded')], default='pending', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='clacheck',
+            index=models.Index(fields=['repository', 'number', 'status'], name='api_clachec_reposit_c5a630_idx'),
+        ),
+        migrations.RunPython(backfill_pull_request_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_clacheck_head_sha_clacheck_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pullrequeststate',
+            name='pull_request',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='MissingCLA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(db_index=True, max_length=255)),
+                ('pull_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='missing_clas', to='api.pullrequeststate')),
+            ],
+            options={
+                'verbose_name': 'Missing CLA',
+                'verbose_name_plural': 'Missing CLAs',
+                'constraints': [models.UniqueConstraint(fields=('pull_request', 'email'), name='unique_missing_cla')],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+from django.db import models
+from django.utils import timezone
+
+
+class CLACheck(models.Model):
+    """
+    A queued CLA check of a pull request, run by the run_cla_check_worker management command.
+    """
+
+    class Meta:
+        verbose_name = "CLA check"
+        verbose_name_plural = "CLA checks"
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+            models.Index(fields=["repository", "number", "status"]),
+        ]
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+        # a newer event of the same PR arrived, or the PR was closed, before the check was run
+        SUPERSEDED = "superseded"
+
+    repository = models.CharField(max_length=255, blank=True)
+    number = models.PositiveIntegerField(default=0)
+    head_sha = models.CharField(max_length=40, blank=True)
+    pull_request = models.JSONField()
+    status = models.CharField(max_length=16, choices=Status, default=Status.PENDING)
+    result = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.repository}#{self.number} ({self.status})"
+
+
+class CommitVerdict(models.Model):
+    """
+    The cached result of checking one commit.
+
+    Whether a commit is trivial never changes, whether its author has a CLA is valid as long as
+    cla_version matches the current DataVersion of the CLA data.
+    """
+
+    sha = models.CharField(primary_key=True, max_length=40)
+    email = models.CharField(max_length=255)
+    is_trivial = models.BooleanField()
+    has_cla = models.BooleanField(default=False)
+    cla_version = models.PositiveBigIntegerField(default=0)
+    checked_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        return self.sha
+
+
+class PullRequestState(models.Model):
+    """
+    What the CLA check last published on a pull request, so unchanged results are not written again.
+    """
+
+    issue_url = models.CharField(unique=True, max_length=500)
+    # the statuses URL of a PR points to its head commit
+    statuses_url = models.CharField(max_length=500)
+    state = models.CharField(max_length=16)
+    description = models.TextField()
+    labeled = models.BooleanField(default=False)
+    # the last checked payload, to check the PR again when a missing CLA turns up
+    pull_request = models.JSONField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return self.issue_url
+
+
+class MissingCLA(models.Model):
+    """
+    An author email a pull request is waiting for, indexed so the PR can be checked again as soon as
+    the CLA of the email becomes active.
+    """
+
+    class Meta:
+        verbose_name = "Missing CLA"
+        verbose_name_plural = "Missing CLAs"
+        constraints = [models.UniqueConstraint(fields=["pull_request", "email"], name="unique_missing_cla")]
+
+    pull_request = models.ForeignKey(PullRequestState, on_delete=models.CASCADE, related_name="missing_clas")
+    email = models.CharField(max_length=255, db_index=True)
+
+    def __str__(self) -> str:
+        return self.email
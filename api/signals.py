@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from .tasks import enqueue_rechecks
+from cla.models import CCLA
+from cla.models import ICLA
+
+
+@receiver(pre_save, sender=ICLA)
+def remember_icla_state(sender, instance: ICLA, using: str, **kwargs) -> None:
+    # the email and activity before the save, to tell whether the ICLA has just become active
+    previous = ICLA.objects.using(using).filter(pk=instance.pk).values_list("email_key", "_is_active")
+    instance._previous_state = previous.first() if instance.pk is not None else None
+
+
+@receiver(post_save, sender=ICLA)
+def recheck_on_icla_change(sender, instance: ICLA, **kwargs) -> None:
+    if instance.is_active and getattr(instance, "_previous_state", None) != (instance.email_key, True):
+        transaction.on_commit(lambda: enqueue_rechecks([instance.email]))
+
+
+@receiver(pre_delete, sender=CCLA)
+def remember_ccla_emails(sender, instance: CCLA, **kwargs) -> None:
+    # the ICLAs of a deleted CCLA are detached from it without a save of their own
+    instance._icla_emails = list(instance.icla_set.values_list("email", flat=True))
+
+
+@receiver(post_delete, sender=CCLA)
+def recheck_on_ccla_delete(sender, instance: CCLA, **kwargs) -> None:
+    if emails := getattr(instance, "_icla_emails", None):
+        transaction.on_commit(lambda: enqueue_rechecks(emails))
@@ -0,0 +1,200 @@
+import logging
+import threading
+from collections.abc import Iterable
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db import connections
+from django.db.models import F
+from django.db.models import Q
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .cla_check import get_pull_request_key
+from .cla_check import process
+from .models import CLACheck
+from .models import MissingCLA
+from .models import PullRequestState
+from base import metrics
+from base.common import normalize_email
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_check(pr: Mapping[str, Any]) -> CLACheck:
+    """
+    Queue a check of the PR to be run once the PR has been quiet for CLA_CHECK_QUIET_WINDOW seconds.
+
+    A check of the same PR that is still waiting takes over the new payload instead, so a burst of
+    events results in a single check of the latest head commit.
+    """
+    repository, number = get_pull_request_key(pr)
+    fields = {
+        "pull_request": pr,
+        "head_sha": pr["_links"]["statuses"]["href"].rsplit("/", 1)[-1],
+        "run_after": timezone.now() + timedelta(seconds=settings.CLA_CHECK_QUIET_WINDOW),
+    }
+    pending = CLACheck.objects.filter(repository=repository, number=number, status=CLACheck.Status.PENDING)
+    if pending.update(**fields):
+        check = pending.latest("pk")
+        logger.info("Coalesced the event of %s#%s into CLA check %s", repository, number, check.pk)
+        return check
+    check = CLACheck.objects.create(repository=repository, number=number, **fields)
+    logger.info("Queued CLA check %s for %s#%s", check.pk, repository, number)
+    return check
+
+
+def cancel_checks(pr: Mapping[str, Any]) -> int:
+    """
+    Drop the checks of the PR that are waiting or running, return how many were dropped. A running
+    check publishes nothing once it has been dropped.
+    """
+    repository, number = get_pull_request_key(pr)
+    statuses = [CLACheck.Status.PENDING, CLACheck.Status.RUNNING]
+    unfinished = CLACheck.objects.filter(repository=repository, number=number, status__in=statuses)
+    count = unfinished.update(status=CLACheck.Status.SUPERSEDED, finished_at=timezone.now())
+    if count:
+        logger.info("Dropped %s unfinished CLA checks of the closed %s#%s", count, repository, number)
+    return count
+
+
+def enqueue_rechecks(emails: Iterable[str]) -> int:
+    """
+    Queue a check of every PR waiting for one of the emails, return how many were queued.
+
+    A PR that already has a check waiting is skipped: that check reads the CLAs when it runs, and its
+    payload may be newer than the stored one.
+    """
+    emails = {normalize_email(email) for email in emails}
+    waiting = MissingCLA.objects.filter(email__in=emails).values("pull_request")
+    states = PullRequestState.objects.filter(pk__in=waiting, pull_request__isnull=False)
+    count = 0
+    for pr in states.values_list("pull_request", flat=True):
+        repository, number = get_pull_request_key(pr)
+        if CLACheck.objects.filter(repository=repository, number=number, status=CLACheck.Status.PENDING).exists():
+            continue
+        enqueue_check(pr)
+        count += 1
+    if count:
+        logger.info("Queued CLA checks of %s PRs waiting for %s", count, ", ".join(sorted(emails)))
+    return count
+
+
+def _claimable() -> Q:
+    now = timezone.now()
+    pending = Q(status=CLACheck.Status.PENDING, run_after__lte=now)
+    # a running check whose worker has died is claimed again after CLA_CHECK_TIMEOUT seconds
+    abandoned = Q(status=CLACheck.Status.RUNNING, started_at__lt=now - timedelta(seconds=settings.CLA_CHECK_TIMEOUT))
+    return pending | abandoned
+
+
+def _running(repository: str, number: int) -> QuerySet[CLACheck]:
+    stale = timezone.now() - timedelta(seconds=settings.CLA_CHECK_TIMEOUT)
+    return CLACheck.objects.filter(
+        repository=repository, number=number, status=CLACheck.Status.RUNNING, started_at__gte=stale
+    )
+
+
+def claim_check() -> CLACheck | None:
+    """
+    Take the next due check off the queue.
+
+    A check is discarded when a newer event of the same PR has been queued, and it waits while
+    another check of the same PR is running, so results are never published out of order. The claim
+    itself is a conditional UPDATE, so concurrent workers never run the same check twice even on
+    databases without SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+    candidates = CLACheck.objects.filter(_claimable()).order_by("run_after", "pk")
+    candidates = candidates.values_list("pk", "repository", "number")[: settings.CLA_CHECK_WORKERS * 2]
+    for pk, repository, number in candidates:
+        if CLACheck.objects.filter(repository=repository, number=number, pk__gt=pk).exists():
+            now = timezone.now()
+            superseded = CLACheck.Status.SUPERSEDED
+            if CLACheck.objects.filter(_claimable(), pk=pk).update(status=superseded, finished_at=now):
+                logger.info("CLA check %s is superseded by a newer event of %s#%s", pk, repository, number)
+            continue
+        if _running(repository, number).exclude(pk=pk).exists():
+            continue
+        claimed = CLACheck.objects.filter(_claimable(), pk=pk).update(
+            status=CLACheck.Status.RUNNING,
+            started_at=timezone.now(),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return CLACheck.objects.get(pk=pk)
+    return None
+
+
+def run_check(check: CLACheck) -> None:
+    logger.info("Run CLA check %s, attempt %s", check.pk, check.attempts)
+    try:
+        check.result = process(check.pull_request, check)
+    except Exception as e:
+        logger.exception("CLA check %s failed", check.pk)
+        check.error = repr(e)
+        if check.attempts < settings.CLA_CHECK_MAX_ATTEMPTS:
+            check.status = CLACheck.Status.PENDING
+            check.run_after = timezone.now() + timedelta(seconds=settings.CLA_CHECK_RETRY_DELAY * check.attempts)
+        else:
+            check.status = CLACheck.Status.FAILED
+            check.finished_at = timezone.now()
+    else:
+        check.status = CLACheck.Status.DONE
+        check.error = ""
+        check.finished_at = timezone.now()
+    # a check cancelled while it ran, as its PR was closed, keeps its status
+    fields = ("status", "result", "error", "run_after", "finished_at")
+    CLACheck.objects.filter(pk=check.pk, status=CLACheck.Status.RUNNING).update(
+        **{field: getattr(check, field) for field in fields}
+    )
+
+
+def run_pending() -> int:
+    """
+    Run every due check in the current thread and return how many were run.
+    """
+    count = 0
+    while check := claim_check():
+        run_check(check)
+        count += 1
+    return count
+
+
+def _work(stop: threading.Event, poll_interval: float) -> None:
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                check = claim_check()
+            except Exception:
+                logger.exception("Failed to claim a CLA check")
+                check = None
+            if check:
+                try:
+                    run_check(check)
+                except Exception:
+                    # the check is claimed again once CLA_CHECK_TIMEOUT has passed
+                    logger.exception("Failed to run CLA check %s", check.pk)
+            else:
+                stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+
+
+def run_worker(workers: int, poll_interval: float, stop: threading.Event) -> None:
+    """
+    Poll the queue with a pool of threads until the stop event is set.
+    """
+    logger.info("Start %s CLA check workers", workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cla-check") as executor:
+        futures = [executor.submit(_work, stop, poll_interval) for _ in range(workers)]
+        # the worker serves no HTTP, so its metrics are reported to the log
+        while not stop.wait(settings.CLA_CHECK_METRICS_LOG_INTERVAL):
+            logger.info("Metrics: %s", metrics.snapshot())
+    for future in futures:
+        future.result()
+    logger.info("CLA check workers stopped")
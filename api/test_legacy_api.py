@@ -1,3 +1,4 @@
+import importlib
 import json
 from datetime import date
 from datetime import datetime
@@ -6,11 +7,22 @@ from datetime import timezone
 from typing import Any
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+from django.http import JsonResponse
 from django.test import Client
+from django.urls import clear_url_caches
+from django.urls import resolve
 from django.urls import reverse
 from pytest_mock import MockerFixture
 
+import base.urls
+from base import metrics
+from cla.models import DataVersion
 from cla.models import ICLA
+from personnel.index import identity_index
 from personnel.models import Email
 from personnel.models import Group
 from personnel.models import Identity
@@ -103,6 +115,7 @@ def test_person_memberof_and_group_active_members():
         ("eve-gh", True),
         # email
         ("eve@example.org", True),
+        ("Eve@Example.ORG", True),
         # identity
         ("eve-id", True),
         ("nonexistent", False),
@@ -124,23 +137,149 @@ def test_person_find_various_identifiers(needle: str, expected: bool):
         assert found is None
 
 
+@pytest.mark.django_db
+def test_person_find_is_a_single_query(django_assert_num_queries):
+    eve = make_person(name="Eve", nick="shared", emails=["eve@example.org"], identities=["eve-id", "eve@example.org"])
+    make_person(name="Mallory", nick="mal", identities=["shared"], ghe=None, github=None, rev=None)
+
+    with django_assert_num_queries(1):
+        # the same person found through several kinds of identifiers
+        assert Person.find("eve@example.org") == eve
+    with django_assert_num_queries(1):
+        # the nick of one person is the identity of another
+        assert Person.find("shared") is None
+    with django_assert_num_queries(1):
+        assert Person.find("nobody") is None
+
+
+@pytest.fixture()
+def enable_identity_index(settings):
+    settings.PERSONNEL_IDENTITY_INDEX = True
+    identity_index.invalidate()
+    yield
+    identity_index.invalidate()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enable_identity_index")
+def test_identity_index_resolves_without_queries(client: Client, django_assert_num_queries):
+    eve = make_person(name="Eve", nick="eve-nick", emails=["Eve@Example.org"], identities=["eve-id"])
+    make_person(name="Mallory", nick="shared", identities=["shared"], ghe=None, github=None, rev=None)
+    make_person(name="Trent", nick="shared", ghe=None, github=None, rev=None)
+    identity_index.lookup("warm-up")
+
+    with django_assert_num_queries(0):
+        assert identity_index.lookup("eve-nick") == {eve.pk}
+        assert identity_index.lookup("eve@example.ORG") == {eve.pk}
+        assert len(identity_index.lookup("shared")) == 2
+        assert identity_index.lookup("nobody") == set()
+
+    # only the data version of the ETag is read, the person comes with its ids and memberships
+    with django_assert_num_queries(1):
+        resp = client.get(reverse("0-person-id", args=("eve-id",)))
+    assert json.loads(resp.content)["ids"] == eve.ids
+    assert client.get(reverse("0-person-id", args=("shared",))).status_code == 204
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enable_identity_index")
+def test_identity_index_follows_changes(django_capture_on_commit_callbacks, mocker: MockerFixture):
+    eve = make_person(name="Eve")
+    identity_index.lookup("warm-up")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Email.objects.create(person=eve, email="eve@new.example.org")
+        eve.nick = "eve-renamed"
+        eve.save()
+    # the changed person is patched in, the index is not rebuilt
+    build = mocker.spy(identity_index, "_build")
+    assert identity_index.lookup("eve@new.example.org") == {eve.pk}
+    assert identity_index.lookup("eve-renamed") == {eve.pk}
+    assert identity_index.lookup("Eve") == {eve.pk}
+    since = date.today() - timedelta(days=1)
+    with django_capture_on_commit_callbacks(execute=True):
+        group = Group.objects.create(name="eng")
+        add_membership(eve, group, since=since, until=None)
+    assert identity_index.people[eve.pk].memberof == {"eng": str(since)}
+    with django_capture_on_commit_callbacks(execute=True):
+        group.name = "platform"
+        group.save()
+    assert identity_index.people[eve.pk].memberof == {"platform": str(since)}
+    assert build.call_count == 0
+
+    # a change made by another process is noticed with the next version check
+    Identity.objects.bulk_create([Identity(person=eve, identity="eve-new-id")])
+    DataVersion.bump(DataVersion.PERSONNEL)
+    assert identity_index.lookup("eve-new-id") == set()
+    identity_index.checked_at = 0
+    assert identity_index.lookup("eve-new-id") == {eve.pk}
+    assert build.call_count == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        eve.delete()
+    assert identity_index.lookup("Eve") == set()
+    assert build.call_count == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enable_identity_index")
+@pytest.mark.parametrize("insensitive", [False, True])
+def test_identity_index_compares_like_the_database(mocker: MockerFixture, insensitive: bool):
+    if insensitive:
+        # as on MySQL, where the default collation ignores the case, accents and trailing spaces
+        mocker.patch("base.common.INSENSITIVE_COLLATION_VENDORS", {connection.vendor})
+    eve = make_person(name="Eve", nick="eve-nick", identities=["eve-id"])
+
+    for id in ["Eve", "eve-nick", "eve-id"]:
+        assert identity_index.lookup(id) == {eve.pk}
+        assert Person.find(id) == eve
+    for id in ["EVE", "Évé", "Eve-Nick ", "EVE-ID"]:
+        assert identity_index.lookup(id) == ({eve.pk} if insensitive else set())
+        if not insensitive:
+            assert Person.find(id) is None
+
+
 @pytest.mark.django_db
 def test_list_people_returns_all_ids(client: Client):
     a = make_person(name="Anna", nick="an", ghe=None, github=None, rev=None)
     b = make_person(name="Ben", nick="bn", ghe=None, github=None, rev=None)
     response = client.get(reverse("0-people"))
     assert response.status_code == 200
-    payload = json.loads(response.content)
+    payload = json.loads(response.getvalue())
     assert a.ids in payload
     assert b.ids in payload
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize("count", [1, 10])
+def test_list_people_query_count_does_not_grow_with_people(client: Client, django_assert_num_queries, count: int):
+    people = [
+        make_person(
+            name=f"P{i}",
+            emails=[f"p{i}@example.org", f"p{i}@alt.example.org"],
+            identities=[f"p{i}-id", f"p{i}@example.org"],
+            nick=f"p{i}",
+            ghe=None,
+            github=None,
+            rev=None,
+        )
+        for i in range(count)
+    ]
+    expected = {json.dumps(person.ids) for person in people}
+
+    # the data version, the people, their emails and their identities
+    with django_assert_num_queries(4):
+        payload = json.loads(client.get(reverse("0-people")).getvalue())
+
+    assert {json.dumps(ids) for ids in payload} == expected
+
+
 @pytest.mark.django_db
 def test_list_people_uses_model_method_mocked(mocker: MockerFixture, client: Client):
     mocker.patch.object(Person, "list_people", return_value=[["stub@example.org", "Stub"]])
     response = client.get(reverse("0-people"))
     assert response.status_code == 200
-    assert json.loads(response.content) == [["stub@example.org", "Stub"]]
+    assert json.loads(response.getvalue()) == [["stub@example.org", "Stub"]]
 
 
 @pytest.mark.django_db
@@ -245,6 +384,29 @@ def test_get_group_members_only_active(client: Client):
     assert all(ids != c.ids for ids in data)
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize("count", [1, 10])
+def test_group_endpoints_query_count_does_not_grow_with_members(client: Client, django_assert_num_queries, count: int):
+    today = date.today()
+    g = Group.objects.create(name="eng")
+    for i in range(count):
+        p = make_person(name=f"P{i}", nick=f"p{i}", ghe=None, github=None, rev=None)
+        ICLA.objects.create(email=f"p{i}@example.org", person=p, cla_pdf=f"ICLA/p{i}.pdf")
+        # overlapping memberships must not duplicate the member
+        add_membership(p, g, since=None, until=None)
+        add_membership(p, g, since=today - timedelta(days=10), until=None)
+
+    # the data version, the group, the members, their emails and their identities
+    with django_assert_num_queries(5):
+        members = json.loads(client.get(reverse("0-group-group-members", args=("eng",))).content)
+    # the data versions, the group and the emails of the active ICLAs
+    with django_assert_num_queries(3):
+        emails = json.loads(client.get(reverse("0-group-group-clas", args=("eng",))).content)
+
+    assert len(members) == count
+    assert sorted(emails) == sorted(f"p{i}@example.org" for i in range(count))
+
+
 @pytest.mark.django_db
 def test_get_group_members_group_not_found_returns_empty(client: Client):
     resp = client.get(reverse("0-group-group-members", args=("nope",)))
@@ -282,14 +444,34 @@ def test_get_group_members_cla_group_not_found_returns_empty(client: Client):
 
 
 @pytest.mark.django_db
-def test_get_list_clas_returns_sorted_active_emails(client: Client):
+def test_get_list_clas_returns_sorted_active_emails(client: Client, django_assert_num_queries):
     ICLA.objects.create(email="b@example.org", cla_pdf="ICLA/b.pdf")
     ICLA.objects.create(email="a@example.org", cla_pdf="ICLA/a.pdf")
     ICLA.objects.create(email="x@example.org")
 
-    resp = client.get(reverse("0-clas"))
+    # the data version and the emails
+    with django_assert_num_queries(2):
+        resp = client.get(reverse("0-clas"))
+        content = resp.getvalue()
     assert resp.status_code == 200
-    assert json.loads(resp.content) == ["a@example.org", "b@example.org"]
+    assert json.loads(content) == ["a@example.org", "b@example.org"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("count", [0, 2, 5], ids=["empty", "one-chunk", "several-chunks"])
+def test_streamed_lists_match_json_response(client: Client, mocker: MockerFixture, count: int):
+    mocker.patch("base.common.CHUNK_SIZE", 2)
+    emails = ["Zed@example.org", "b@example.org", "ärmin@example.org", "A@example.org", "a@example.org"][:count]
+    for email in emails:
+        ICLA.objects.create(email=email, cla_pdf="ICLA/some.pdf")
+        make_person(name=email.split("@")[0], emails=[email], nick=None, ghe=None, github=None, rev=None)
+
+    clas = client.get(reverse("0-clas"))
+    people = client.get(reverse("0-people"))
+
+    assert clas.getvalue() == JsonResponse(sorted(emails), safe=False).content
+    expected = [person.ids for person in Person.objects.order_by("pk")]
+    assert people.getvalue() == JsonResponse(expected, safe=False).content
 
 
 FIXED_NOW = datetime(2025, 6, 25, 13, 45, 31, 892000, tzinfo=timezone.utc)
@@ -328,3 +510,310 @@ def test_get_icla_status_active(client: Client, fields: dict[str, Any]):
     response = client.get(reverse("0-hascla-email", args=(email,)))
     assert response.status_code == 200
     assert json.loads(response.content) == [1]
+
+
+@pytest.mark.django_db
+def test_get_icla_status_ignores_email_case(client: Client):
+    ICLA.objects.create(email="Mixed.Case@Example.com", cla_pdf="ICLA/some.pdf")
+    response = client.get(reverse("0-hascla-email", args=("mixed.case@example.COM",)))
+    assert response.status_code == 200
+    assert json.loads(response.content) == [1]
+
+
+@pytest.fixture()
+def enable_response_cache(settings):
+    settings.LEGACY_API_CACHE = "legacy_api"
+    caches["legacy_api"].clear()
+    yield
+    caches["legacy_api"].clear()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enable_response_cache")
+def test_cached_responses_follow_the_data_versions(
+    client: Client, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    p = make_person(name="Ann", emails=["ann@example.org"], ghe=None, github=None, rev=None)
+    ICLA.objects.create(email="ann@example.org", person=p, cla_pdf="ICLA/ann.pdf")
+    url = reverse("0-person-id-hascla", args=("Ann",))
+    first = client.get(url)
+    # streamed responses are cached as they are sent
+    client.get(reverse("0-clas")).getvalue()
+
+    # only the data versions of the ETags are read, the cache keys are made of the same ones
+    with django_assert_num_queries(2):
+        assert client.get(url).content == first.content
+        assert json.loads(client.get(reverse("0-clas")).content) == ["ann@example.org"]
+
+    # a change of the personnel data keeps the responses built from the CLAs only
+    with django_capture_on_commit_callbacks(execute=True):
+        Group.objects.create(name="eng")
+    with django_assert_num_queries(1):
+        client.get(reverse("0-clas"))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ICLA.objects.create(email="ann@new.example.org", person=p, cla_pdf="ICLA/ann2.pdf")
+    assert sorted(json.loads(client.get(url).content)) == ["ann@example.org", "ann@new.example.org"]
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enable_response_cache")
+def test_cached_responses_are_dropped_only_for_the_changed_people_and_groups(
+    client: Client, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    ann = make_person(name="Ann", ghe=None, github=None, rev=None)
+    ben = make_person(name="Ben", ghe=None, github=None, rev=None)
+    eng, ops = Group.objects.create(name="eng"), Group.objects.create(name="ops")
+    add_membership(ann, eng, since=None, until=None)
+    urls = [
+        reverse("0-person-id", args=("Ann",)),
+        reverse("0-person-id-membership", args=("Ann",)),
+        reverse("0-group-group-members", args=("eng",)),
+    ]
+    first = [client.get(url).content for url in urls]
+
+    # another person and another group change
+    with django_capture_on_commit_callbacks(execute=True):
+        add_membership(ben, ops, since=None, until=None)
+        ben.country = "CZ"
+        ben.save()
+    # the data versions of the ETag and of the cached response are read, once per response
+    with django_assert_num_queries(2):
+        assert client.get(urls[0]).content == first[0]
+    with django_assert_num_queries(1):
+        assert client.get(urls[0]).content == first[0]
+    assert [client.get(url).content for url in urls[1:]] == first[1:]
+
+    # a change of Ann drops the responses about her and about her groups
+    with django_capture_on_commit_callbacks(execute=True):
+        Email.objects.create(person=ann, email="ann@new.example.org")
+    assert "ann@new.example.org" in json.loads(client.get(urls[0]).content)["ids"]
+    assert "ann@new.example.org" in json.loads(client.get(urls[2]).content)[0]
+    # as does a change of her group
+    with django_capture_on_commit_callbacks(execute=True):
+        eng.name = "platform"
+        eng.save()
+    assert json.loads(client.get(urls[1]).content) == {"platform": "None"}
+    assert client.get(urls[2]).status_code == 204
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enable_response_cache")
+def test_cached_body_goes_out_with_its_etag(client: Client, django_capture_on_commit_callbacks):
+    icla = ICLA.objects.create(email="ann@example.org", cla_pdf="ICLA/ann.pdf")
+    url = reverse("0-clas")
+    first = client.get(url)
+    assert first.getvalue() == b'["ann@example.org"]'
+
+    with django_capture_on_commit_callbacks(execute=True):
+        icla.email = "ann@new.example.org"
+        icla.save()
+
+    second = client.get(url, headers={"If-None-Match": first["ETag"]})
+    assert second.status_code == 200
+    assert second["ETag"] != first["ETag"]
+    assert second.getvalue() == b'["ann@new.example.org"]'
+    # the cached body is answered with the ETag it was built with
+    cached = client.get(url)
+    assert (cached["ETag"], cached.content) == (second["ETag"], b'["ann@new.example.org"]')
+    assert client.get(url, headers={"If-None-Match": second["ETag"]}).status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enable_response_cache")
+def test_cached_memberships_expire_at_midnight(client: Client, mocker: MockerFixture):
+    today = date.today()
+    p = make_person(name="Ann", ghe=None, github=None, rev=None)
+    add_membership(p, Group.objects.create(name="eng"), since=None, until=today + timedelta(days=1))
+    url = reverse("0-person-id-ismemberof-group", args=("Ann", "eng"))
+    assert client.get(url).status_code == 200
+
+    tomorrow = datetime.combine(today + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    mocker.patch("django.utils.timezone.now", return_value=tomorrow)
+
+    assert client.get(url).status_code == 204
+    assert metrics.snapshot()["counters"]["response_cache.misses"] >= 2
+
+
+@pytest.mark.django_db
+def test_unchanged_data_is_not_modified(client: Client, django_assert_num_queries):
+    p = make_person(name="Ann", emails=["ann@example.org"], ghe=None, github=None, rev=None)
+    ICLA.objects.create(email="ann@example.org", person=p, cla_pdf="ICLA/ann.pdf")
+    url = reverse("0-clas")
+    first = client.get(url)
+    assert first.getvalue() == b'["ann@example.org"]'
+
+    # only the data version is read
+    with django_assert_num_queries(1):
+        resp = client.get(url, headers={"If-None-Match": first["ETag"]})
+    assert resp.status_code == 304
+
+    # the ETag of the people does not change with the CLAs
+    people_etag = client.get(reverse("0-people"))["ETag"]
+    ICLA.objects.create(email="ben@example.org", cla_pdf="ICLA/ben.pdf")
+    assert client.get(url, headers={"If-None-Match": first["ETag"]}).status_code == 200
+    assert client.get(reverse("0-people"), headers={"If-None-Match": people_etag}).status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["get", "post"])
+def test_batch_hascla(client: Client, django_assert_num_queries, method: str):
+    ICLA.objects.create(email="Volunteer@example.org", cla_pdf="ICLA/v.pdf")
+    ICLA.objects.create(email="employee@example.org", cla_pdf="ICLA/e.pdf", point_of_contact="poc@example.org")
+    ICLA.objects.create(email="unsigned@example.org")
+    emails = ["volunteer@EXAMPLE.org", "employee@example.org", "unsigned@example.org", "missing@example.org"]
+    url = reverse("0-hascla")
+
+    # the data version of the ETag, which a POST has not, and the active ICLAs
+    with django_assert_num_queries(1 if method == "post" else 2):
+        if method == "post":
+            resp = client.post(url, emails, content_type="application/json", headers={"If-Match": '"stale"'})
+        else:
+            resp = client.get(url, {"email": emails})
+
+    assert resp.status_code == 200
+    assert resp.has_header("ETag") == (method == "get")
+    assert json.loads(resp.content) == {
+        "volunteer@EXAMPLE.org": True,
+        "employee@example.org": True,
+        "unsigned@example.org": False,
+        "missing@example.org": False,
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "body",
+    [b"not json", b'{"email": "a@example.org"}', b"[1, 2]", json.dumps(["a@example.org"] * 3).encode()],
+    ids=["invalid-json", "not-a-list", "not-strings", "too-many"],
+)
+def test_batch_hascla_rejects_bad_requests(client: Client, settings, body: bytes):
+    settings.LEGACY_API_BATCH_LIMIT = 2
+    resp = client.post(reverse("0-hascla"), body, content_type="application/json")
+    assert resp.status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["get", "post"])
+def test_batch_person_lookup(client: Client, django_assert_num_queries, method: str):
+    today = date.today()
+    g = Group.objects.create(name="eng")
+    people = [
+        make_person(name=f"P{i}", nick=f"p{i}", ghe=f"p{i}-ghe", github=f"p{i}-gh", rev=f"p{i}-rev") for i in range(5)
+    ]
+    for person in people:
+        add_membership(person, g, since=today - timedelta(days=1), until=None)
+    make_person(name="Twin", nick="twin", ghe=None, github=None, rev=None, emails=["twin1@example.org"])
+    make_person(name="Twin", nick="twin2", ghe=None, github=None, rev=None, emails=["twin2@example.org"])
+    ids = ["p0", "P1@Example.org", "p2-gh", "p3-ghe", "p4-id", "Twin", "nobody"]
+    url = reverse("0-person")
+
+    # the data version of a GET, the matches by field, identity and email, the people and what they are made of
+    with django_assert_num_queries(7 if method == "post" else 8):
+        if method == "post":
+            resp = client.post(url, ids, content_type="application/json", headers={"If-Match": '"stale"'})
+        else:
+            resp = client.get(url, {"id": ids})
+
+    assert resp.status_code == 200
+    result = json.loads(resp.content)
+    for id, person in zip(ids, people):
+        assert result[id] == json.loads(client.get(reverse("0-person-id", args=(person.name,))).content)
+    assert result["Twin"] == {"error": "ambiguous"}
+    assert result["nobody"] == {"error": "not found"}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("insensitive", [False, True])
+def test_batch_person_lookup_compares_like_the_database(mocker: MockerFixture, insensitive: bool):
+    if insensitive:
+        # as on MySQL, where the default collation ignores the case, accents and trailing spaces
+        mocker.patch("base.common.INSENSITIVE_COLLATION_VENDORS", {connection.vendor})
+    alice = make_person(name="alice", nick="ali", identities=["alice-id"])
+    ids = ["alice", "ALICE", "Âlice", "Ali ", "alice-id", "ALICE-ID", "alice@example.org", "ÁLICE@example.org"]
+
+    result = Person.find_many(ids)
+
+    assert result["alice"] == result["alice-id"] == result["alice@example.org"] == [alice]
+    for id in ["ALICE", "Âlice", "Ali ", "ALICE-ID", "ÁLICE@example.org"]:
+        assert result[id] == ([alice] if insensitive else [])
+        if not insensitive:
+            assert Person.find(id) is None
+
+
+@pytest.fixture()
+def async_views(settings):
+    settings.ASYNC_VIEWS = True
+    importlib.reload(base.urls)
+    clear_url_caches()
+    yield
+    settings.ASYNC_VIEWS = False
+    importlib.reload(base.urls)
+    clear_url_caches()
+
+
+def read_content(resp: HttpResponse) -> bytes:
+    async def read_async() -> bytes:
+        return b"".join([chunk async for chunk in resp.streaming_content])
+
+    if not resp.streaming:
+        return resp.content
+    return async_to_sync(read_async)() if resp.is_async else resp.getvalue()
+
+
+@pytest.mark.django_db
+def test_async_views_answer_the_same(client: Client, request: pytest.FixtureRequest):
+    today = date.today()
+    eng = Group.objects.create(name="eng")
+    ann = make_person(name="Ann", emails=["ann@example.org"], ghe=None, github=None, rev=None)
+    ben = make_person(name="Ben", nick="ben", emails=["Ben@Example.org"], ghe=None, github=None, rev=None)
+    make_person(name="Twin", nick="t1", ghe=None, github=None, rev=None, emails=["t1@example.org"])
+    make_person(name="Twin", nick="t2", ghe=None, github=None, rev=None, emails=["t2@example.org"])
+    add_membership(ann, eng, since=today - timedelta(days=1), until=None)
+    add_membership(ben, eng, since=None, until=today - timedelta(days=1))
+    ICLA.objects.create(email="ann@example.org", person=ann, cla_pdf="ICLA/ann.pdf")
+    ICLA.objects.create(email="ben@example.org", person=ben)
+    requests = [
+        ("get", reverse("0-people"), None),
+        ("get", reverse("0-person-id", args=("ann@EXAMPLE.org",)), None),
+        ("get", reverse("0-person-id", args=("Twin",)), None),
+        ("get", reverse("0-person-id-membership", args=("ann-id",)), None),
+        ("get", reverse("0-person-id-ismemberof-group", args=("Ann", "eng")), None),
+        ("get", reverse("0-person-id-ismemberof-group", args=("ben", "eng")), None),
+        ("get", reverse("0-person-id-valueoftag-tag", args=("ali", "country")), None),
+        ("get", reverse("0-person-id-hascla", args=("Ann",)), None),
+        ("get", reverse("0-group-group-members", args=("eng",)), None),
+        ("get", reverse("0-group-group-members", args=("nope",)), None),
+        ("get", reverse("0-group-group-clas", args=("eng",)), None),
+        ("get", reverse("0-hascla-email", args=("ANN@example.org",)), None),
+        ("get", reverse("0-hascla-email", args=("ben@example.org",)), None),
+        ("get", reverse("0-clas"), None),
+        ("post", reverse("0-hascla"), ["ann@example.org", "ben@example.org"]),
+        ("post", reverse("0-person"), ["Ann", "ben", "Twin", "nobody"]),
+    ]
+
+    def answer(method: str, url: str, data: list | None) -> tuple:
+        if method == "post":
+            resp = client.post(url, data, content_type="application/json")
+        else:
+            resp = client.get(url)
+        return resp.status_code, resp.get("ETag"), read_content(resp)
+
+    expected = [answer(*item) for item in requests]
+    request.getfixturevalue("async_views")
+    assert resolve(reverse("0-clas")).func.__module__ == "api.legacy_api_async_views"
+    assert [answer(*item) for item in requests] == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("async_views", "enable_response_cache")
+def test_async_views_are_cached_and_not_modified(client: Client, django_assert_num_queries):
+    ICLA.objects.create(email="ann@example.org", cla_pdf="ICLA/ann.pdf")
+    url = reverse("0-clas")
+    first = client.get(url)
+    assert read_content(first) == b'["ann@example.org"]'
+
+    # only the data versions of the ETags are read
+    with django_assert_num_queries(2):
+        assert client.get(url).content == b'["ann@example.org"]'
+        assert client.get(url, headers={"If-None-Match": first["ETag"]}).status_code == 304
@@ -1,14 +1,30 @@
+import hashlib
 import json
+import threading
+import time
 from typing import Any
 from typing import TypedDict
 
 import pytest
+import requests
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.core import mail
 from django.test import Client
+from django.test import RequestFactory
 from django.urls import reverse
 from pytest_mock import MockerFixture
 
 from api import cla_check
+from api import github
+from api import tasks
+from api import views
+from api.models import CLACheck
+from api.models import CommitVerdict
+from api.models import MissingCLA
+from api.models import PullRequestState
+from base import metrics
+from cla.models import DataVersion
 from cla.models import ICLA
 
 
@@ -17,6 +33,7 @@ def set_settings():
     with pytest.MonkeyPatch.context() as mp:
         mp.setattr(settings, "CLA_CHECK_WEBHOOK_SECRET_SLUG", "test_secret_slug")
         mp.setattr(settings, "GITHUB_API_TOKEN", "dummy_token")
+        mp.setattr(settings, "CLA_CHECK_QUIET_WINDOW", 0)
         yield
 
 
@@ -34,38 +51,85 @@ FAKE_PR: PR = {
 }
 
 
-def _commit(email: str, message: str) -> dict[str, Any]:
-    return {"commit": {"author": {"email": email}, "message": message}}
+def _commit(email: str, message: str, sha: str | None = None) -> dict[str, Any]:
+    sha = sha or hashlib.sha1(f"{email}\n{message}".encode()).hexdigest()
+    return {"sha": sha, "commit": {"author": {"email": email}, "message": message}}
 
 
 class _Resp:
-    def __init__(self, *, json_data=None, status_code=200):
+    def __init__(self, *, json_data=None, status_code=200, links=None, headers=None):
         self._json = json_data
         self.status_code = status_code
+        self.links = links or {}
+        self.headers = headers or {}
 
     def json(self):
         return self._json
 
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+class _Session:
+    """Stands in for the requests session of api.github, one mock per HTTP method."""
+
+    def __init__(self, mocker: MockerFixture):
+        self.get = mocker.MagicMock(return_value=_Resp())
+        self.post = mocker.MagicMock(return_value=_Resp())
+        self.delete = mocker.MagicMock(return_value=_Resp())
+
+    def request(self, method: str, url: str, **kwargs):
+        return getattr(self, method.lower())(url, **kwargs)
+
+
+@pytest.fixture()
+def github_api(mocker: MockerFixture) -> _Session:
+    session = _Session(mocker)
+    mocker.patch("api.github.get_session", return_value=session)
+    limiters: dict[str, github.RateLimiter] = {}
+
+    def get_rate_limiter(resource: str = github.CORE) -> github.RateLimiter:
+        if resource not in limiters:
+            limiters[resource] = github.RateLimiter(rate=1000, burst=1000, max_queue=100, timeout=5, resource=resource)
+        return limiters[resource]
+
+    mocker.patch("api.github.get_rate_limiter", side_effect=get_rate_limiter)
+    mocker.patch("api.github.time.sleep")
+    return session
+
+
+def _post_and_run(client: Client, body: bytes) -> str:
+    """Deliver the webhook, then run the queued check the way the worker does."""
+    resp = client.post(reverse("webhooks-icla-check"), body, content_type="application/json", headers=HEADERS)
+    assert resp.status_code == 202
+    assert tasks.run_pending() == 1
+    check = CLACheck.objects.get()
+    assert check.status == CLACheck.Status.DONE
+    return check.result
+
 
 @pytest.mark.django_db
-def test_process_cla_trivial(client: Client, mocker: MockerFixture):
+def test_process_cla_trivial(client: Client, mocker: MockerFixture, github_api: _Session):
     """Single trivial commit -> success status + remove label."""
     commits = [_commit("user@example.com", "fix: typo\n\nCLA: Trivial")]
     payload = {"action": "opened", "pull_request": FAKE_PR}
     body = json.dumps(payload).encode("utf-8")
 
     # Mock GitHub API calls used by api.cla_check.process()
-    m_get = mocker.patch("requests.get", return_value=_Resp(json_data=commits))
-    m_post = mocker.patch("requests.post")
-    m_del = mocker.patch("requests.delete", return_value=_Resp(status_code=200))
-
-    resp = client.post(reverse("webhooks-icla-check"), body, content_type="application/json", headers=HEADERS)
+    m_get = mocker.patch.object(github_api, "get", return_value=_Resp(json_data=commits))
+    m_post = github_api.post
+    m_del = mocker.patch.object(github_api, "delete", return_value=_Resp(status_code=200))
 
-    assert resp.status_code == 200
-    assert resp.content == b"Trivial"
+    assert _post_and_run(client, body) == "Trivial"
 
     # requests.get called for commits
-    m_get.assert_called_once_with(FAKE_PR["commits_url"], headers=cla_check.get_headers(settings.GITHUB_API_TOKEN))
+    m_get.assert_called_once_with(
+        FAKE_PR["commits_url"],
+        params={"per_page": cla_check.COMMITS_PER_PAGE},
+        headers=github.get_headers(settings.GITHUB_API_TOKEN),
+        timeout=(settings.GITHUB_API_CONNECT_TIMEOUT, settings.GITHUB_API_READ_TIMEOUT),
+    )
 
     # One POST for statuses; NO POST to labels endpoint
     status_url = FAKE_PR["_links"]["statuses"]["href"]
@@ -77,20 +141,18 @@ def test_process_cla_trivial(client: Client, mocker: MockerFixture):
 
 
 @pytest.mark.django_db
-def test_process_missing_cla(client: Client, mocker: MockerFixture):
+def test_process_missing_cla(client: Client, mocker: MockerFixture, github_api: _Session):
     """Non-trivial commit + no ICLA in DB -> failure + add label."""
     commits = [_commit("missing@example.com", "implement feature")]
     payload = {"action": "opened", "pull_request": FAKE_PR}
     body = json.dumps(payload).encode("utf-8")
 
-    mocker.patch("requests.get", return_value=_Resp(json_data=commits))
-    m_post = mocker.patch("requests.post")
-    m_del = mocker.patch("requests.delete")  # should NOT be used in this path
+    mocker.patch.object(github_api, "get", return_value=_Resp(json_data=commits))
+    m_post = github_api.post
+    m_del = github_api.delete  # should NOT be used in this path
 
     # DB: let ICLA lookup 404 naturally (empty DB)
-    resp = client.post(reverse("webhooks-icla-check"), body, content_type="application/json", headers=HEADERS)
-    assert resp.status_code == 200
-    assert resp.content == b"CLA missing"
+    assert _post_and_run(client, body) == "CLA missing"
 
     # Status updated (POST to statuses) and label added (POST to labels)
     status_url = FAKE_PR["_links"]["statuses"]["href"]
@@ -102,24 +164,20 @@ def test_process_missing_cla(client: Client, mocker: MockerFixture):
 
 
 @pytest.mark.django_db
-def test_process_cla_in_db(client: Client, mocker: MockerFixture):
+def test_process_cla_in_db(client: Client, mocker: MockerFixture, github_api: _Session):
     """Non-trivial commit + ICLA in DB and active -> success + remove label."""
     commits = [_commit("known@example.com", "normal message")]
     payload = {"action": "opened", "pull_request": FAKE_PR}
     body = json.dumps(payload).encode("utf-8")
 
-    mocker.patch("requests.get", return_value=_Resp(json_data=commits))
-    m_post = mocker.patch("requests.post")
-    m_del = mocker.patch("requests.delete")
+    mocker.patch.object(github_api, "get", return_value=_Resp(json_data=commits))
+    m_post = github_api.post
+    m_del = github_api.delete
 
-    # ORM: emulate found & active ICLA
-    mock_icla = mocker.MagicMock()
-    mock_icla.is_active = True
-    mocker.patch.object(ICLA.objects, "get", return_value=mock_icla)
+    # DB: found & active ICLA
+    ICLA.objects.create(email="known@example.com", cla_pdf="ICLA/known.pdf")
 
-    resp = client.post(reverse("webhooks-icla-check"), body, content_type="application/json", headers=HEADERS)
-    assert resp.status_code == 200
-    assert resp.content == b"CLA found"
+    assert _post_and_run(client, body) == "CLA found"
 
     status_url = FAKE_PR["_links"]["statuses"]["href"]
     assert any(call.args[0] == status_url for call in m_post.mock_calls)
@@ -130,7 +188,7 @@ def test_process_cla_in_db(client: Client, mocker: MockerFixture):
 
 
 @pytest.mark.django_db
-def test_process_cla_multiple_commits_non_trivial(client: Client, mocker: MockerFixture):
+def test_process_cla_multiple_commits_non_trivial(client: Client, mocker: MockerFixture, github_api: _Session):
     """
     Multiple commits, both non-trivial; one email has CLA, the other does not -> failure + add label.
     """
@@ -141,25 +199,16 @@ def test_process_cla_multiple_commits_non_trivial(client: Client, mocker: Mocker
     payload = {"action": "opened", "pull_request": FAKE_PR}
     body = json.dumps(payload).encode("utf-8")
 
-    mocker.patch("requests.get", return_value=_Resp(json_data=commits))
-    m_post = mocker.patch("requests.post")
-    m_del = mocker.patch("requests.delete")
+    mocker.patch.object(github_api, "get", return_value=_Resp(json_data=commits))
+    m_post = github_api.post
+    m_del = github_api.delete
 
-    # ORM behavior:
+    # DB:
     # withcla@example.com => found active
-    # nacla@example.com   => raise DoesNotExist
-    def _get(email: str, **_):
-        if email == "withcla@example.com":
-            o = mocker.MagicMock()
-            o.is_active = True
-            return o
-        raise ICLA.DoesNotExist
-
-    mocker.patch.object(ICLA.objects, "get", side_effect=_get)
+    # nacla@example.com   => not found
+    ICLA.objects.create(email="withcla@example.com", cla_pdf="ICLA/withcla.pdf")
 
-    resp = client.post(reverse("webhooks-icla-check"), body, content_type="application/json", headers=HEADERS)
-    assert resp.status_code == 200
-    assert resp.content == b"CLA missing"
+    assert _post_and_run(client, body) == "CLA missing"
 
     # Failure status and add_label invoked
     status_url = FAKE_PR["_links"]["statuses"]["href"]
@@ -171,7 +220,7 @@ def test_process_cla_multiple_commits_non_trivial(client: Client, mocker: Mocker
 
 
 @pytest.mark.django_db
-def test_process_cla_multiple_commits_all_trivial(client: Client, mocker: MockerFixture):
+def test_process_cla_multiple_commits_all_trivial(client: Client, mocker: MockerFixture, github_api: _Session):
     """Multiple commits all trivial -> success + remove label."""
     commits = [
         _commit("a@example.com", "CLA: trivial\n\nsmall tweak"),
@@ -180,16 +229,14 @@ def test_process_cla_multiple_commits_all_trivial(client: Client, mocker: Mocker
     payload = {"action": "opened", "pull_request": FAKE_PR}
     body = json.dumps(payload).encode("utf-8")
 
-    mocker.patch("requests.get", return_value=_Resp(json_data=commits))
-    m_post = mocker.patch("requests.post")
-    m_del = mocker.patch("requests.delete", return_value=_Resp(status_code=200))
+    mocker.patch.object(github_api, "get", return_value=_Resp(json_data=commits))
+    m_post = github_api.post
+    m_del = mocker.patch.object(github_api, "delete", return_value=_Resp(status_code=200))
 
-    # DB: irrelevant since everything is trivial, but keep it harmless
-    mocker.patch.object(ICLA.objects, "get", side_effect=ICLA.DoesNotExist)
+    # DB: no lookup is needed since everything is trivial
+    mocker.patch.object(ICLA.objects, "filter", side_effect=AssertionError("no CLA lookup expected"))
 
-    resp = client.post(reverse("webhooks-icla-check"), body, content_type="application/json", headers=HEADERS)
-    assert resp.status_code == 200
-    assert resp.content == b"Trivial"
+    assert _post_and_run(client, body) == "Trivial"
 
     status_url = FAKE_PR["_links"]["statuses"]["href"]
     assert any(call.args[0] == status_url for call in m_post.mock_calls)
@@ -197,3 +244,604 @@ def test_process_cla_multiple_commits_all_trivial(client: Client, mocker: Mocker
     assert any(call.args[0].startswith(f'{FAKE_PR["issue_url"]}/labels/') for call in m_del.mock_calls)
     # No label add
     assert not any(call.args[0] == f'{FAKE_PR["issue_url"]}/labels' for call in m_post.mock_calls)
+
+
+@pytest.mark.django_db
+def test_get_cla_statuses_single_query(django_assert_num_queries):
+    """All commit authors are resolved with one query, whatever their number."""
+    ICLA.objects.create(email="active@example.com", cla_pdf="ICLA/active.pdf")
+    ICLA.objects.create(email="inactive@example.com")
+    emails = ["active@example.com", "inactive@example.com", "missing@example.com", "active@example.com"]
+
+    with django_assert_num_queries(1):
+        statuses = cla_check.get_cla_statuses(emails)
+
+    assert statuses == {
+        "active@example.com": True,
+        "inactive@example.com": False,
+        "missing@example.com": False,
+    }
+
+
+@pytest.mark.django_db
+def test_get_cla_statuses_ignores_email_case():
+    ICLA.objects.create(email="Active@Example.com", cla_pdf="ICLA/active.pdf")
+
+    assert cla_check.get_cla_statuses(["active@example.COM"]) == {"active@example.COM": True}
+
+
+@pytest.mark.django_db
+def test_get_cla_statuses_no_emails(django_assert_num_queries):
+    with django_assert_num_queries(0):
+        assert cla_check.get_cla_statuses([]) == {}
+
+
+def test_get_pr_commits_fetches_all_pages(mocker: MockerFixture, github_api: _Session):
+    """The first page points to the last one, the remaining pages are fetched as well."""
+    commits_url = FAKE_PR["commits_url"]
+    pages = {
+        None: _Resp(
+            json_data=[_commit("p1@example.com", "one")],
+            links={"last": {"url": f"{commits_url}?per_page=100&page=3", "rel": "last"}},
+        ),
+        2: _Resp(json_data=[_commit("p2@example.com", "two")]),
+        3: _Resp(json_data=[_commit("p3@example.com", "three")]),
+    }
+
+    def _get(url: str, params: dict[str, int], **_):
+        assert url == commits_url
+        assert params["per_page"] == cla_check.COMMITS_PER_PAGE
+        return pages[params.get("page")]
+
+    m_get = mocker.patch.object(github_api, "get", side_effect=_get)
+
+    commits = list(cla_check.get_pr_commits(commits_url))
+
+    assert m_get.call_count == 3
+    assert sorted(c["commit"]["author"]["email"] for c in commits) == [
+        "p1@example.com",
+        "p2@example.com",
+        "p3@example.com",
+    ]
+
+
+@pytest.mark.django_db
+def test_webhook_only_queues_the_check(client: Client, github_api: _Session):
+    """The webhook returns 202 without talking to GitHub; the check waits in the queue."""
+    m_get = github_api.get
+    payload = {"action": "synchronize", "pull_request": FAKE_PR}
+
+    resp = client.post(
+        reverse("webhooks-icla-check"), json.dumps(payload), content_type="application/json", headers=HEADERS
+    )
+
+    assert resp.status_code == 202
+    assert not m_get.mock_calls
+    check = CLACheck.objects.get()
+    assert check.status == CLACheck.Status.PENDING
+    assert check.pull_request == FAKE_PR
+
+
+@pytest.mark.django_db
+def test_webhook_rejects_malformed_pull_request(client: Client):
+    payload = {"action": "opened", "pull_request": {"issue_url": FAKE_PR["issue_url"]}}
+
+    resp = client.post(
+        reverse("webhooks-icla-check"), json.dumps(payload), content_type="application/json", headers=HEADERS
+    )
+
+    assert resp.status_code == 400
+    assert not CLACheck.objects.exists()
+
+
+@pytest.mark.django_db
+def test_webhook_null_action_is_not_queued(client: Client):
+    payload = {"action": "labeled", "pull_request": FAKE_PR}
+
+    resp = client.post(
+        reverse("webhooks-icla-check"), json.dumps(payload), content_type="application/json", headers=HEADERS
+    )
+
+    assert resp.status_code == 200
+    assert resp.content == b"No-op action labeled"
+    assert not CLACheck.objects.exists()
+
+
+@pytest.mark.django_db
+def test_webhook_closed_drops_waiting_checks(client: Client):
+    tasks.enqueue_check(FAKE_PR)
+    payload = {"action": "closed", "pull_request": FAKE_PR}
+
+    resp = client.post(
+        reverse("webhooks-icla-check"), json.dumps(payload), content_type="application/json", headers=HEADERS
+    )
+
+    assert resp.status_code == 200
+    assert CLACheck.objects.get().status == CLACheck.Status.SUPERSEDED
+    assert tasks.claim_check() is None
+
+
+@pytest.mark.django_db
+def test_check_running_when_the_pr_is_closed_records_nothing(client: Client, github_api: _Session):
+    check = tasks.enqueue_check(FAKE_PR)
+    assert tasks.claim_check() == check
+
+    def close_pr(*args, **kwargs) -> _Resp:
+        payload = {"action": "closed", "pull_request": FAKE_PR}
+        client.post(
+            reverse("webhooks-icla-check"), json.dumps(payload), content_type="application/json", headers=HEADERS
+        )
+        return _Resp(json_data=[_commit("late@example.com", "feature")])
+
+    github_api.get.side_effect = close_pr
+    tasks.run_check(check)
+
+    check.refresh_from_db()
+    assert check.status == CLACheck.Status.SUPERSEDED
+    assert not PullRequestState.objects.exists()
+    assert not MissingCLA.objects.exists()
+    assert not github_api.post.mock_calls
+
+
+def test_worker_survives_a_failing_check(mocker: MockerFixture):
+    stop = threading.Event()
+    checks = iter([CLACheck(pk=1), CLACheck(pk=2)])
+
+    def claim_check():
+        if (check := next(checks, None)) is None:
+            stop.set()
+        return check
+
+    mocker.patch("api.tasks.claim_check", side_effect=claim_check)
+    mocker.patch("api.tasks.close_old_connections")
+    run_check = mocker.patch("api.tasks.run_check", side_effect=RuntimeError("database is gone"))
+
+    tasks._work(stop, 0)
+
+    assert run_check.call_count == 2
+
+
+@pytest.mark.django_db
+def test_failed_check_is_retried_then_marked_failed(mocker: MockerFixture, github_api: _Session, settings):
+    settings.CLA_CHECK_MAX_ATTEMPTS = 2
+    settings.CLA_CHECK_RETRY_DELAY = 0
+    mocker.patch.object(github_api, "get", side_effect=ConnectionError("GitHub is down"))
+    check = tasks.enqueue_check(FAKE_PR)
+
+    assert tasks.run_pending() == 2
+
+    check.refresh_from_db()
+    assert check.status == CLACheck.Status.FAILED
+    assert check.attempts == 2
+    assert "GitHub is down" in check.error
+
+
+@pytest.mark.django_db
+def test_claim_check_is_exclusive():
+    tasks.enqueue_check(FAKE_PR)
+
+    assert tasks.claim_check() is not None
+    assert tasks.claim_check() is None
+
+
+def test_github_request_retries_server_errors(github_api: _Session):
+    github_api.get.side_effect = [_Resp(status_code=502), _Resp(status_code=503), _Resp(json_data=[])]
+
+    r = github.get(FAKE_PR["commits_url"], metric="test")
+
+    assert r.status_code == 200
+    assert github_api.get.call_count == 3
+
+
+def test_github_request_waits_for_secondary_rate_limit(mocker: MockerFixture, github_api: _Session):
+    pause = mocker.patch.object(github.get_rate_limiter(), "pause")
+    sleep = mocker.patch("api.github.time.sleep")
+    github_api.post.side_effect = [_Resp(status_code=403, headers={"Retry-After": "7"}), _Resp(status_code=201)]
+
+    r = github.post(FAKE_PR["_links"]["statuses"]["href"], json={}, metric="test")
+
+    assert r.status_code == 201
+    pause.assert_called_once_with(7.0)
+    sleep.assert_not_called()
+
+
+def _acquire_in_thread(limiter: github.RateLimiter, priority: github.Priority, served: list) -> threading.Thread:
+    def acquire():
+        try:
+            limiter.acquire(priority)
+            served.append(priority)
+        except github.RateLimitBackpressure:
+            served.append("rejected")
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    return thread
+
+
+def _wait_for_queue(limiter: github.RateLimiter, depth: int) -> None:
+    deadline = time.monotonic() + 5
+    while len(limiter.waiting) < depth and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_rate_limiter_serves_status_writes_first():
+    limiter = github.RateLimiter(rate=1000, burst=1, max_queue=10, timeout=5)
+    limiter.pause(0.2)
+    served = []
+
+    threads = [_acquire_in_thread(limiter, github.Priority.LABEL, served)]
+    _wait_for_queue(limiter, 1)
+    threads.append(_acquire_in_thread(limiter, github.Priority.READ, served))
+    _wait_for_queue(limiter, 2)
+    threads.append(_acquire_in_thread(limiter, github.Priority.STATUS, served))
+    for thread in threads:
+        thread.join()
+
+    assert served == [github.Priority.STATUS, github.Priority.READ, github.Priority.LABEL]
+
+
+def test_rate_limiter_refuses_calls_when_the_queue_is_full():
+    metrics.reset()
+    limiter = github.RateLimiter(rate=1000, burst=1, max_queue=1, timeout=5)
+    limiter.pause(0.2)
+    served = []
+
+    thread = _acquire_in_thread(limiter, github.Priority.READ, served)
+    _wait_for_queue(limiter, 1)
+    with pytest.raises(github.RateLimitBackpressure):
+        limiter.acquire(github.Priority.STATUS)
+    thread.join()
+
+    assert served == [github.Priority.READ]
+    assert metrics.snapshot()["counters"]["github.scheduler.rejected"] == 1
+
+
+def test_rate_limiter_follows_the_remaining_budget(github_api: _Session):
+    metrics.reset()
+    limiter = github.get_rate_limiter()
+    reset = str(int(time.time()) + 60)
+    github_api.get.return_value = _Resp(headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset})
+
+    github.get(FAKE_PR["commits_url"], metric="test")
+
+    assert metrics.snapshot()["gauges"]["github.rate_limit.core.remaining"] == 0
+    assert limiter.paused_until > time.monotonic() + 50
+    limiter.timeout = 0.01
+    with pytest.raises(github.RateLimitBackpressure):
+        github.get(FAKE_PR["commits_url"], metric="test")
+
+
+def test_rate_limits_of_rest_and_graphql_are_separate(github_api: _Session):
+    reset = str(int(time.time()) + 60)
+    github_api.post.return_value = _Resp(
+        headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset, "X-RateLimit-Resource": "graphql"}
+    )
+    github.post(settings.GITHUB_GRAPHQL_URL, json={}, metric="test")
+    assert github.get_rate_limiter(github.GRAPHQL).paused_until > time.monotonic() + 50
+
+    # an exhausted GraphQL budget doesn't hold back the REST calls
+    github.get_rate_limiter(github.CORE).timeout = 0.01
+    github_api.post.return_value = _Resp(status_code=201)
+    assert github.post(FAKE_PR["_links"]["statuses"]["href"], json={}, metric="test").status_code == 201
+
+
+def test_github_request_gives_up_after_max_retries(github_api: _Session, settings):
+    settings.GITHUB_API_MAX_RETRIES = 2
+    github_api.get.return_value = _Resp(status_code=500)
+
+    r = github.get(FAKE_PR["commits_url"], metric="test")
+
+    assert r.status_code == 500
+    assert github_api.get.call_count == 3
+
+
+def test_github_request_does_not_retry_client_errors(github_api: _Session):
+    github_api.delete.return_value = _Resp(status_code=404)
+
+    assert github.delete(FAKE_PR["issue_url"], metric="test").status_code == 404
+    assert github_api.delete.call_count == 1
+
+
+def test_github_request_records_latency(github_api: _Session):
+    metrics.reset()
+
+    github.get(FAKE_PR["commits_url"], metric="test")
+    github.get(FAKE_PR["commits_url"], metric="test")
+
+    assert metrics.snapshot()["timers"]["github.test"]["count"] == 2
+
+
+def test_github_session_is_reused():
+    assert github.get_session() is github.get_session()
+
+
+def test_metrics_endpoint(client: Client):
+    metrics.reset()
+    metrics.incr("test.counter")
+
+    resp = client.get(reverse("metrics"))
+
+    assert resp.status_code == 200
+    assert json.loads(resp.content)["counters"] == {"test.counter": 1}
+
+
+@pytest.mark.django_db
+def test_cached_verdicts_skip_parsing_and_cla_lookup(mocker: MockerFixture, github_api: _Session):
+    """A second check of the same commits parses nothing and doesn't query the CLA DB."""
+    ICLA.objects.create(email="known@example.com", cla_pdf="ICLA/known.pdf")
+    commits = [_commit("known@example.com", "feature"), _commit("typo@example.com", "CLA: trivial")]
+    github_api.get.return_value = _Resp(json_data=commits)
+    assert cla_check.process(FAKE_PR) == "CLA found"
+    assert CommitVerdict.objects.count() == 2
+
+    m_filter = mocker.spy(ICLA.objects, "filter")
+    m_search = mocker.patch.object(cla_check, "TRIVIAL")
+
+    assert cla_check.process(FAKE_PR) == "CLA found"
+    assert not m_filter.mock_calls
+    assert not m_search.mock_calls
+
+
+@pytest.mark.django_db
+def test_cached_verdicts_are_rechecked_after_cla_change(github_api: _Session):
+    """A verdict older than the last ICLA change is resolved again."""
+    github_api.get.return_value = _Resp(json_data=[_commit("late@example.com", "feature")])
+    assert cla_check.process(FAKE_PR) == "CLA missing"
+
+    ICLA.objects.create(email="late@example.com", cla_pdf="ICLA/late.pdf")
+
+    assert cla_check.process(FAKE_PR) == "CLA found"
+    verdict = CommitVerdict.objects.get()
+    assert verdict.has_cla
+    assert verdict.cla_version == DataVersion.get(DataVersion.CLA)
+
+
+def _labels_of(*names: str) -> list[dict[str, str]]:
+    return [{"name": name} for name in names]
+
+
+@pytest.mark.django_db
+def test_label_absent_in_payload_is_not_removed(github_api: _Session):
+    github_api.get.return_value = _Resp(json_data=[_commit("user@example.com", "CLA: trivial")])
+
+    assert cla_check.process(FAKE_PR | {"labels": _labels_of("bug")}) == "Trivial"
+
+    assert github_api.post.call_count == 1
+    assert not github_api.delete.mock_calls
+
+
+@pytest.mark.django_db
+def test_label_present_in_payload_is_not_added_again(github_api: _Session):
+    github_api.get.return_value = _Resp(json_data=[_commit("missing@example.com", "feature")])
+
+    assert cla_check.process(FAKE_PR | {"labels": _labels_of(cla_check.CLA_LABEL)}) == "CLA missing"
+
+    status_url = FAKE_PR["_links"]["statuses"]["href"]
+    assert [call.args[0] for call in github_api.post.mock_calls] == [status_url]
+
+
+@pytest.mark.django_db
+def test_label_is_removed_despite_a_stale_payload(github_api: _Session):
+    """A payload queued before the label was added doesn't leave the label stuck."""
+    github_api.get.return_value = _Resp(json_data=[_commit("late@example.com", "feature")])
+    stale = FAKE_PR | {"labels": _labels_of("bug")}
+    assert cla_check.process(stale) == "CLA missing"
+    assert PullRequestState.objects.get().labeled
+
+    ICLA.objects.create(email="late@example.com", cla_pdf="ICLA/late.pdf")
+    github_api.delete.reset_mock()
+    assert cla_check.process(stale) == "CLA found"
+
+    assert any(call.args[0].startswith(f"{FAKE_PR['issue_url']}/labels/") for call in github_api.delete.mock_calls)
+    assert not PullRequestState.objects.get().labeled
+
+
+@pytest.mark.django_db
+def test_unchanged_result_is_not_published_again(github_api: _Session):
+    """The same outcome for the same head commit writes nothing the second time."""
+    github_api.get.return_value = _Resp(json_data=[_commit("missing@example.com", "feature")])
+    assert cla_check.process(FAKE_PR) == "CLA missing"
+    assert github_api.post.call_count == 2
+
+    github_api.post.reset_mock()
+    assert cla_check.process(FAKE_PR) == "CLA missing"
+    assert not github_api.post.mock_calls
+    assert not github_api.delete.mock_calls
+
+
+@pytest.mark.django_db
+def test_new_head_commit_is_published(github_api: _Session):
+    github_api.get.return_value = _Resp(json_data=[_commit("user@example.com", "CLA: trivial")])
+    cla_check.process(FAKE_PR)
+    github_api.post.reset_mock()
+
+    new_head = FAKE_PR | {
+        "_links": {"statuses": {"href": "https://api.github.com/repos/openssl/openssl/statuses/sha456"}}
+    }
+    assert cla_check.process(new_head) == "Trivial"
+
+    assert [call.args[0] for call in github_api.post.mock_calls] == [new_head["_links"]["statuses"]["href"]]
+
+
+@pytest.mark.django_db
+def test_burst_of_events_is_coalesced(settings):
+    """Events arriving within the quiet window end up in one check of the latest head."""
+    settings.CLA_CHECK_QUIET_WINDOW = 60
+    tasks.enqueue_check(FAKE_PR)
+    new_head = FAKE_PR | {
+        "_links": {"statuses": {"href": "https://api.github.com/repos/openssl/openssl/statuses/sha456"}}
+    }
+    tasks.enqueue_check(new_head)
+
+    check = CLACheck.objects.get()
+    assert (check.repository, check.number, check.head_sha) == ("openssl/openssl", 123, "sha456")
+    assert check.pull_request == new_head
+    # nothing is due before the PR has been quiet for the window
+    assert tasks.claim_check() is None
+
+
+@pytest.mark.django_db
+def test_stale_check_is_superseded():
+    old = tasks.enqueue_check(FAKE_PR)
+    # a newer event that raced past the coalescing
+    new = CLACheck.objects.create(repository=old.repository, number=old.number, pull_request=FAKE_PR)
+
+    assert tasks.claim_check() == new
+
+    old.refresh_from_db()
+    assert old.status == CLACheck.Status.SUPERSEDED
+
+
+@pytest.mark.django_db
+def test_check_waits_for_running_check_of_the_same_pr():
+    running = tasks.enqueue_check(FAKE_PR)
+    assert tasks.claim_check() == running
+
+    waiting = tasks.enqueue_check(FAKE_PR)
+    other_pr = tasks.enqueue_check(FAKE_PR | {"issue_url": "https://api.github.com/repos/openssl/openssl/issues/7"})
+
+    assert tasks.claim_check() == other_pr
+    assert tasks.claim_check() is None
+
+    running.status = CLACheck.Status.DONE
+    running.save()
+    assert tasks.claim_check() == waiting
+
+
+@pytest.mark.django_db
+def test_waiting_pr_is_rechecked_when_icla_becomes_active(github_api: _Session, django_capture_on_commit_callbacks):
+    github_api.get.return_value = _Resp(json_data=[_commit("late@example.com", "feature")])
+    pr = FAKE_PR | {"labels": _labels_of("bug")}
+    assert cla_check.process(pr) == "CLA missing"
+    assert list(MissingCLA.objects.values_list("email", flat=True)) == ["late@example.com"]
+
+    # an unrelated ICLA doesn't trigger anything
+    with django_capture_on_commit_callbacks(execute=True):
+        ICLA.objects.create(email="other@example.com", cla_pdf="ICLA/other.pdf")
+    assert not CLACheck.objects.exists()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        icla = ICLA.objects.create(email="late@example.com")
+    assert not CLACheck.objects.exists()
+    with django_capture_on_commit_callbacks(execute=True):
+        icla.cla_pdf = "ICLA/late.pdf"
+        icla.save()
+
+    github_api.post.reset_mock()
+    assert tasks.run_pending() == 1
+    assert CLACheck.objects.get().result == "CLA found"
+    assert not MissingCLA.objects.exists()
+    # the stored payload knows the label was added by the first check
+    assert any(call.args[0].startswith(f"{FAKE_PR['issue_url']}/labels/") for call in github_api.delete.mock_calls)
+
+
+@pytest.mark.django_db
+def test_saving_an_active_icla_queues_nothing(github_api: _Session, django_capture_on_commit_callbacks):
+    github_api.get.return_value = _Resp(json_data=[_commit("late@example.com", "feature")])
+    cla_check.process(FAKE_PR)
+    with django_capture_on_commit_callbacks(execute=True):
+        icla = ICLA.objects.create(email="late@example.com", cla_pdf="ICLA/late.pdf")
+    CLACheck.objects.all().delete()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        icla.telephone = "123"
+        icla.save()
+
+    assert not CLACheck.objects.exists()
+
+
+@pytest.mark.django_db
+def test_recheck_keeps_the_payload_of_a_waiting_check(github_api: _Session):
+    github_api.get.return_value = _Resp(json_data=[_commit("late@example.com", "feature")])
+    cla_check.process(FAKE_PR)
+    new_head = FAKE_PR | {
+        "_links": {"statuses": {"href": "https://api.github.com/repos/openssl/openssl/statuses/sha456"}}
+    }
+    tasks.enqueue_check(new_head)
+
+    assert tasks.enqueue_rechecks(["late@example.com"]) == 0
+
+    assert CLACheck.objects.get().pull_request == new_head
+
+
+@pytest.mark.django_db
+def test_closed_pr_is_no_longer_waiting(client: Client, github_api: _Session):
+    github_api.get.return_value = _Resp(json_data=[_commit("late@example.com", "feature")])
+    cla_check.process(FAKE_PR)
+    payload = {"action": "closed", "pull_request": FAKE_PR}
+
+    resp = client.post(
+        reverse("webhooks-icla-check"), json.dumps(payload), content_type="application/json", headers=HEADERS
+    )
+
+    assert resp.status_code == 200
+    assert not MissingCLA.objects.exists()
+
+
+def _graphql_page(commits: list[dict[str, Any]], cursor: str | None = None, first: bool = True, **extra) -> _Resp:
+    page = {
+        "commits": {
+            "pageInfo": {"hasNextPage": cursor is not None, "endCursor": cursor},
+            "nodes": [
+                {"commit": {"oid": c["sha"], "message": c["commit"]["message"], "author": c["commit"]["author"]}}
+                for c in commits
+            ],
+        }
+    }
+    if first:
+        page |= {"labels": {"nodes": []}, "head": {"nodes": []}} | extra
+    return _Resp(json_data={"data": {"repository": {"pullRequest": page}}})
+
+
+@pytest.mark.django_db
+def test_graphql_mode_fetches_everything_in_one_query_per_page(github_api: _Session, settings):
+    settings.GITHUB_USE_GRAPHQL = True
+    pages = [
+        _graphql_page([_commit("a@example.com", "feature")], cursor="c1", labels={"nodes": [{"name": "bug"}]}),
+        _graphql_page([_commit("b@example.com", "CLA: trivial")], first=False),
+    ]
+    posts = []
+
+    def _post(url: str, **kwargs):
+        posts.append(url)
+        if url == settings.GITHUB_GRAPHQL_URL:
+            variables = kwargs["json"]["variables"]
+            assert (variables["owner"], variables["name"], variables["number"]) == ("openssl", "openssl", 123)
+            return pages.pop(0)
+        return _Resp(status_code=201)
+
+    github_api.post.side_effect = _post
+
+    assert cla_check.process(FAKE_PR) == "CLA missing"
+
+    status_url = FAKE_PR["_links"]["statuses"]["href"]
+    labels_url = f"{FAKE_PR['issue_url']}/labels"
+    assert posts == [settings.GITHUB_GRAPHQL_URL, settings.GITHUB_GRAPHQL_URL, status_url, labels_url]
+    assert not github_api.get.mock_calls
+
+
+@pytest.mark.django_db
+def test_graphql_mode_skips_writes_matching_github_state(github_api: _Session, settings):
+    settings.GITHUB_USE_GRAPHQL = True
+    head = {"commit": {"oid": "sha123", "status": {"context": {"state": "SUCCESS", "description": "CLA found"}}}}
+    ICLA.objects.create(email="known@example.com", cla_pdf="ICLA/known.pdf")
+    github_api.post.return_value = _graphql_page([_commit("known@example.com", "feature")], head={"nodes": [head]})
+
+    assert cla_check.process(FAKE_PR) == "CLA found"
+
+    assert github_api.post.call_count == 1
+    assert not github_api.delete.mock_calls
+
+
+@pytest.mark.django_db
+def test_async_contact_form_sends_the_message(mocker: MockerFixture, rf: RequestFactory, settings):
+    settings.CONTACT_FORM_RECIPIENTS = "team@example.org"
+    settings.CONTACT_FORM_SUBMISSION_SUCCESS_URL = "https://example.org/thanks/"
+    mocker.patch("api.views.averify_turnstile_token", return_value=True)
+    data = {"name": "Ann", "email": "ann@example.org", "message": "Hi", "cf-turnstile-response": "token"}
+
+    response = async_to_sync(views.asend_message_from_contact_form)(rf.post(reverse("contact-submit"), data))
+
+    assert response.status_code == 302
+    assert response.url == "https://example.org/thanks/"
+    assert [message.body for message in mail.outbox] == ["Name: Ann\nEmail: ann@example.org\nMessage: Hi"]
@@ -1,17 +1,24 @@
 import json
 import logging
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.mail import EmailMessage
 from django.http import HttpRequest
 from django.http import HttpResponse
 from django.http import HttpResponseBadRequest
 from django.http import HttpResponseRedirect
+from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_safe
 
-from .cla_check import process
+from .cla_check import forget
 from .forms import ContactForm
+from .tasks import cancel_checks
+from .tasks import enqueue_check
+from base import metrics
+from base.common import averify_turnstile_token
 from base.common import verify_turnstile_token
 
 logger = logging.getLogger(__name__)
@@ -27,6 +34,9 @@ NULL_ACTIONS = (
     "review_request_removed",
 )
 
+# the fields of the pull_request object used by the CLA check
+PULL_REQUEST_FIELDS = ("commits_url", "issue_url", "_links")
+
 
 @require_POST
 @csrf_exempt
@@ -36,9 +46,31 @@ def handle_github_pull_request_webhook(request: HttpRequest) -> HttpResponse:
         return HttpResponse("pong")
     if request.headers["X-GitHub-Event"] != "pull_request":
         return HttpResponseBadRequest("Only pull_request event is supported.")
-    if action := payload["action"] in NULL_ACTIONS:
+    pr = payload.get("pull_request")
+    if not isinstance(pr, dict) or not all(key in pr for key in PULL_REQUEST_FIELDS):
+        return HttpResponseBadRequest("Malformed pull_request payload.")
+    if (action := payload["action"]) in NULL_ACTIONS:
+        if action == "closed":
+            # a running check is cancelled first, so it cannot record the PR again after forget()
+            cancel_checks(pr)
+            forget(pr)
         return HttpResponse(f"No-op action {action}")
-    return process(payload["pull_request"])
+    enqueue_check(pr)
+    return HttpResponse("Accepted", status=202)
+
+
+def make_contact_message(form: ContactForm) -> EmailMessage:
+    email = form.cleaned_data["email"]
+    name = form.cleaned_data["name"]
+    message = form.cleaned_data["message"]
+    message = f"Name: {name}\nEmail: {email}\nMessage: {message}"
+    return EmailMessage(
+        subject="Contact form message",
+        body=message,
+        reply_to=[email],
+        from_email=settings.NOTIFICATIONS_SENDER_EMAIL,
+        to=[settings.CONTACT_FORM_RECIPIENTS],
+    )
 
 
 @require_POST
@@ -54,15 +86,31 @@ def send_message_from_contact_form(request: HttpRequest) -> HttpResponse:
     if not verify_turnstile_token(request):
         logger.warning("Turnstile token verification failed")
         return HttpResponseBadRequest("Turnstile token verification failed")
-    email = form.cleaned_data["email"]
-    name = form.cleaned_data["name"]
-    message = form.cleaned_data["message"]
-    message = f"Name: {name}\nEmail: {email}\nMessage: {message}"
-    EmailMessage(
-        subject="Contact form message",
-        body=message,
-        reply_to=[email],
-        from_email=settings.NOTIFICATIONS_SENDER_EMAIL,
-        to=[settings.CONTACT_FORM_RECIPIENTS],
-    ).send()
+    make_contact_message(form).send()
+    return HttpResponseRedirect(settings.CONTACT_FORM_SUBMISSION_SUCCESS_URL)
+
+
+@require_POST
+@csrf_exempt
+async def asend_message_from_contact_form(request: HttpRequest) -> HttpResponse:
+    """
+    The async counterpart of send_message_from_contact_form.
+    """
+    form = ContactForm(request.POST)
+    if not form.is_valid():
+        logger.warning("Submitted form is not valid: %s", form.errors.as_json())
+        return HttpResponseBadRequest("Submitted form is not valid")
+    if not request.POST.get("cf-turnstile-response"):
+        logger.warning("Missing Turnstile token")
+        return HttpResponseBadRequest("Missing Turnstile token")
+    if not await averify_turnstile_token(request):
+        logger.warning("Turnstile token verification failed")
+        return HttpResponseBadRequest("Turnstile token verification failed")
+    # sending does not touch the database, it does not need to wait for the thread of the ORM
+    await sync_to_async(make_contact_message(form).send, thread_sensitive=False)()
     return HttpResponseRedirect(settings.CONTACT_FORM_SUBMISSION_SUCCESS_URL)
+
+
+@require_safe
+def get_metrics(request: HttpRequest) -> HttpResponse:
+    return JsonResponse(metrics.snapshot())
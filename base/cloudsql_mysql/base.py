@@ -1,24 +1,109 @@
+import atexit
+import logging
+import os
+import threading
+from collections.abc import Callable
+from typing import Any
+
 from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
 from google.cloud.sql.connector import Connector
 from pymysql.constants import CLIENT
 
+from .pool import ConnectionPool
+from base import metrics
+
+logger = logging.getLogger(__name__)
+
+
+_connectors: dict[tuple[str, bool, str], Connector] = {}
+_connectors_pid: int | None = None
+_connectors_lock = threading.Lock()
+_pools: dict[str, ConnectionPool] = {}
+_pools_pid: int | None = None
+
+
+def get_connector(ip_type: str, enable_iam_auth: bool, refresh_strategy: str) -> Connector:
+    """
+    Return the connector of the current process for the options, creating it on first use.
+
+    A connector refreshes the certificates of the instances it has connected to in the background,
+    so a single one is shared by all the connections of a process. A forked worker gets its own.
+    """
+    global _connectors_pid
+    key = (ip_type, enable_iam_auth, refresh_strategy)
+    with _connectors_lock:
+        if _connectors_pid != os.getpid():
+            # the connectors of the parent process are unusable here, their threads are gone
+            _connectors.clear()
+            _connectors_pid = os.getpid()
+        if key not in _connectors:
+            logger.info("Create Cloud SQL connector with ip_type=%s, enable_iam_auth=%s, refresh_strategy=%s", *key)
+            _connectors[key] = Connector(
+                ip_type=ip_type, enable_iam_auth=enable_iam_auth, refresh_strategy=refresh_strategy
+            )
+        return _connectors[key]
+
+
+@atexit.register
+def close_connectors() -> None:
+    with _connectors_lock:
+        if _connectors_pid == os.getpid():
+            for connector in _connectors.values():
+                connector.close()
+        _connectors.clear()
+
+
+def get_pool(alias: str, connect: Callable[[], Any], options: dict) -> ConnectionPool:
+    """
+    Return the connection pool of the current process for the database alias.
+    """
+    global _pools_pid
+    with _connectors_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(connect, name=alias, **options)
+        return _pools[alias]
+
+
+# registered after close_connectors, so it runs before it
+@atexit.register
+def close_pools() -> None:
+    with _connectors_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
 
 class DatabaseWrapper(MySQLDatabaseWrapper):
     """
     Uses the Cloud SQL Python Connector to open every new DB connection.
+
+    When OPTIONS["pool"] is set, to True or to a dict of the options of base.cloudsql_mysql.pool, the
+    connections are borrowed from a pool shared by the threads of the process, and closing them
+    returns them to it.
     """
 
     def get_new_connection(self, conn_params):
+        if options := self.settings_dict["OPTIONS"].get("pool"):
+            options = {} if options is True else options
+            return get_pool(self.alias, lambda: self.connect_instance(conn_params), options).acquire()
+        return self.connect_instance(conn_params)
+
+    def connect_instance(self, conn_params):
         instance_conn_name = self.settings_dict["OPTIONS"]["instance_connection_name"]
         ip_type = self.settings_dict["OPTIONS"].get("ip_type") or "public"
         enable_iam_auth = self.settings_dict["OPTIONS"].get("enable_iam_auth") or False
         refresh_strategy = self.settings_dict["OPTIONS"].get("refresh_strategy") or "background"
-        connector = Connector(ip_type=ip_type, enable_iam_auth=enable_iam_auth, refresh_strategy=refresh_strategy)
-        return connector.connect(
-            instance_conn_name,
-            "pymysql",
-            user=conn_params["user"],
-            db=conn_params["database"],
-            # this is required to Django correctly defines when to use UPDATE in the sql
-            client_flag=CLIENT.FOUND_ROWS,
-        )
+        connector = get_connector(ip_type, enable_iam_auth, refresh_strategy)
+        with metrics.timed("db.connect"):
+            return connector.connect(
+                instance_conn_name,
+                "pymysql",
+                user=conn_params["user"],
+                db=conn_params["database"],
+                # this is required to Django correctly defines when to use UPDATE in the sql
+                client_flag=CLIENT.FOUND_ROWS,
+            )
@@ -0,0 +1,195 @@
+"""A pool of pymysql connections shared by the threads of a process."""
+
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+from pymysql.err import OperationalError
+
+from base import metrics
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    # connections opened on first use and kept open even when they are idle, and the most that can be
+    # open at once
+    "min_size": 0,
+    "max_size": 10,
+    # seconds a connection may stay idle in the pool, and may exist at all, before it is closed
+    "max_idle": 600,
+    "max_lifetime": 3600,
+    # seconds to wait for a connection when all of them are borrowed
+    "timeout": 30,
+    # ping a connection before it is handed out, it is replaced when the ping fails
+    "pre_ping": True,
+}
+
+
+class PooledConnection:
+    """
+    A pymysql connection whose close() returns it to the pool.
+    """
+
+    def __init__(self, pool: "ConnectionPool", connection: Any, created_at: float):
+        self._pool = pool
+        self._connection = connection
+        self.created_at = created_at
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+    def close(self) -> None:
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection, self.created_at)
+
+
+class ConnectionPool:
+    def __init__(self, connect: Callable[[], Any], name: str = "default", **options):
+        unknown = set(options) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown connection pool options: {', '.join(sorted(unknown))}")
+        options = DEFAULTS | options
+        if options["min_size"] > options["max_size"]:
+            raise ValueError("The min_size of a connection pool cannot exceed its max_size")
+        self.connect = connect
+        self.name = name
+        self.min_size = options["min_size"]
+        self.max_size = options["max_size"]
+        self.max_idle = options["max_idle"]
+        self.max_lifetime = options["max_lifetime"]
+        self.timeout = options["timeout"]
+        self.pre_ping = options["pre_ping"]
+        # (connection, created at, returned at), the most recently returned last
+        self.idle: deque[tuple[Any, float, float]] = deque()
+        self.size = 0
+        self.condition = threading.Condition()
+
+    def _report(self) -> None:
+        metrics.set_gauge(f"db.pool.{self.name}.size", self.size)
+        metrics.set_gauge(f"db.pool.{self.name}.idle", len(self.idle))
+
+    def _discard(self, connection: Any) -> None:
+        try:
+            connection.close()
+        except Exception:
+            logger.debug("Failed to close a pooled connection", exc_info=True)
+
+    def _prune(self, now: float) -> list:
+        # called with the condition held, the stale connections are closed by the caller
+        stale = []
+        while self.idle and self.size > self.min_size and now - self.idle[0][2] > self.max_idle:
+            stale.append(self.idle.popleft()[0])
+            self.size -= 1
+        return stale
+
+    def _fill(self) -> None:
+        # the connections up to min_size are opened by the first borrower, and again after they were dropped
+        with self.condition:
+            missing = max(self.min_size - self.size, 0)
+            self.size += missing
+        for opened in range(missing):
+            try:
+                connection = self.connect()
+            except Exception:
+                logger.warning("Failed to open the idle connections of the %s pool", self.name, exc_info=True)
+                with self.condition:
+                    self.size -= missing - opened
+                    self._report()
+                    self.condition.notify_all()
+                return
+            now = time.monotonic()
+            with self.condition:
+                self.idle.append((connection, now, now))
+                self._report()
+                self.condition.notify()
+
+    def acquire(self) -> PooledConnection:
+        start = time.monotonic()
+        deadline = start + self.timeout
+        if self.size < self.min_size:
+            self._fill()
+        while True:
+            connection = None
+            stale = []
+            with self.condition:
+                while True:
+                    now = time.monotonic()
+                    stale.extend(self._prune(now))
+                    if self.idle:
+                        connection, created_at, _ = self.idle.pop()
+                        break
+                    if self.size < self.max_size:
+                        self.size += 1
+                        break
+                    if now >= deadline:
+                        metrics.incr(f"db.pool.{self.name}.timeouts")
+                        raise OperationalError(
+                            f"No connection of the {self.name} pool became free within {self.timeout} seconds"
+                        )
+                    self.condition.wait(deadline - now)
+                self._report()
+            for item in stale:
+                self._discard(item)
+            if connection is None:
+                try:
+                    connection, created_at = self.connect(), time.monotonic()
+                except BaseException:
+                    with self.condition:
+                        self.size -= 1
+                        self._report()
+                        self.condition.notify()
+                    raise
+            elif time.monotonic() - created_at > self.max_lifetime or not self._is_alive(connection):
+                self._drop(connection)
+                continue
+            metrics.observe(f"db.pool.{self.name}.wait", time.monotonic() - start)
+            return PooledConnection(self, connection, created_at)
+
+    def _is_alive(self, connection: Any) -> bool:
+        if not self.pre_ping:
+            return True
+        try:
+            connection.ping(reconnect=False)
+        except Exception:
+            logger.info("A pooled connection of the %s pool is broken, it is replaced", self.name)
+            return False
+        return True
+
+    def _drop(self, connection: Any) -> None:
+        self._discard(connection)
+        with self.condition:
+            self.size -= 1
+            self._report()
+            self.condition.notify()
+
+    def release(self, connection: Any, created_at: float) -> None:
+        now = time.monotonic()
+        if now - created_at > self.max_lifetime:
+            self._drop(connection)
+            return
+        try:
+            # a transaction left open by the borrower must not leak into the next one
+            connection.rollback()
+        except Exception:
+            self._drop(connection)
+            return
+        with self.condition:
+            self.idle.append((connection, created_at, now))
+            stale = self._prune(now)
+            self._report()
+            self.condition.notify()
+        for item in stale:
+            self._discard(item)
+
+    def close(self) -> None:
+        with self.condition:
+            idle, self.idle = self.idle, deque()
+            self.size -= len(idle)
+            self._report()
+        for connection, _, _ in idle:
+            self._discard(connection)
@@ -1,23 +1,184 @@
+import asyncio
 import logging
+import unicodedata
+import weakref
+from collections.abc import AsyncIterable
+from collections.abc import AsyncIterator
+from collections.abc import Iterable
+from collections.abc import Iterator
 
+import aiohttp
 import requests
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.functions import Collate
 from django.http import HttpRequest
+from django.http import StreamingHttpResponse
 
 
 logger = logging.getLogger(__name__)
 
 
+# rows fetched per query, and items serialized per chunk of a streamed response
+CHUNK_SIZE = 1000
+# collations comparing strings by code point, the order of sorted() in Python
+BINARY_COLLATIONS = {"mysql": "utf8mb4_bin", "postgresql": "C", "sqlite": "BINARY"}
+# backends whose default collation compares strings regardless of case, accents and trailing spaces
+INSENSITIVE_COLLATION_VENDORS = {"mysql"}
+TURNSTILE_VERIFY_URL = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
+
+# the HTTP client session of every event loop, it keeps the connections of the loop alive
+_http_sessions: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def normalize_email(email: str) -> str:
+    """
+    Return the canonical form of an email address used for lookups.
+    """
+    return email.strip().lower()
+
+
+def binary_collate(field: str) -> Collate:
+    return Collate(field, BINARY_COLLATIONS[connection.vendor])
+
+
+def collation_key(value: str) -> str:
+    """
+    Return the form of the string that the database compares equal, so matches made in Python agree
+    with its lookups.
+    """
+    if connection.vendor not in INSENSITIVE_COLLATION_VENDORS:
+        return value
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).rstrip(" ")
+
+
+def iter_chunks(queryset: QuerySet, key: str, size: int | None = None) -> Iterator[list]:
+    """
+    Yield the rows of the queryset ordered by the unique `key`, one chunk at a time.
+
+    Every chunk is fetched with its own query starting after the last key of the previous one, so
+    only a single chunk is held in memory even on backends that buffer whole result sets. The rows
+    are model instances, or dicts when the queryset is built with values().
+    """
+    size = size or CHUNK_SIZE
+    queryset = queryset.order_by(key)
+    chunk = list(queryset[:size])
+    while chunk:
+        yield chunk
+        if len(chunk) < size:
+            return
+        last = chunk[-1][key] if isinstance(chunk[-1], dict) else getattr(chunk[-1], key)
+        chunk = list(queryset.filter(**{f"{key}__gt": last})[:size])
+
+
+async def aiter_chunks(queryset: QuerySet, key: str, size: int | None = None) -> AsyncIterator[list]:
+    """
+    The async counterpart of iter_chunks.
+    """
+    size = size or CHUNK_SIZE
+    queryset = queryset.order_by(key)
+    chunk = [row async for row in queryset[:size]]
+    while chunk:
+        yield chunk
+        if len(chunk) < size:
+            return
+        last = chunk[-1][key] if isinstance(chunk[-1], dict) else getattr(chunk[-1], key)
+        chunk = [row async for row in queryset.filter(**{f"{key}__gt": last})[:size]]
+
+
+class _JsonArrayEncoder:
+    """
+    Serialize the items of a JSON array as they are produced, CHUNK_SIZE items per piece of text.
+    """
+
+    def __init__(self) -> None:
+        self.encoder = DjangoJSONEncoder()
+        self.started = False
+        self.parts: list[str] = []
+
+    def add(self, item: object) -> str | None:
+        self.parts.append(self.encoder.encode(item))
+        return self.flush() if len(self.parts) == CHUNK_SIZE else None
+
+    def flush(self) -> str:
+        piece = (", " if self.started else "[") + ", ".join(self.parts)
+        self.started, self.parts = True, []
+        return piece
+
+    def close(self) -> str:
+        if self.parts:
+            return self.flush() + "]"
+        return "]" if self.started else "[]"
+
+
+def streaming_json_response(items: Iterable) -> StreamingHttpResponse:
+    """
+    Serialize the items as a JSON array while they are produced, byte for byte the same as
+    JsonResponse(list(items), safe=False).
+    """
+
+    def encode() -> Iterator[str]:
+        array = _JsonArrayEncoder()
+        for item in items:
+            if (piece := array.add(item)) is not None:
+                yield piece
+        yield array.close()
+
+    return StreamingHttpResponse(encode(), content_type="application/json")
+
+
+def astreaming_json_response(items: AsyncIterable) -> StreamingHttpResponse:
+    """
+    The async counterpart of streaming_json_response, for items produced by an async iterator.
+    """
+
+    async def encode() -> AsyncIterator[str]:
+        array = _JsonArrayEncoder()
+        async for item in items:
+            if (piece := array.add(item)) is not None:
+                yield piece
+        yield array.close()
+
+    return StreamingHttpResponse(encode(), content_type="application/json")
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Return the HTTP client session of the running event loop, creating it on first use.
+    """
+    loop = asyncio.get_running_loop()
+    if (session := _http_sessions.get(loop)) is None or session.closed:
+        session = _http_sessions[loop] = aiohttp.ClientSession()
+    return session
+
+
+def turnstile_data(request: HttpRequest) -> dict[str, str | None]:
+    return {
+        "secret": settings.CLOUDFLARE_TURNSTILE_SECRET_KEY,
+        "response": request.POST.get("cf-turnstile-response"),
+        "remoteip": request.META.get("CF-Connecting-IP"),
+    }
+
+
 def verify_turnstile_token(request: HttpRequest) -> bool:
     logger.info("Verify Turnstile token")
-    resp = requests.post(
-        "https://challenges.cloudflare.com/turnstile/v0/siteverify",
-        data={
-            "secret": settings.CLOUDFLARE_TURNSTILE_SECRET_KEY,
-            "response": request.POST.get("cf-turnstile-response"),
-            "remoteip": request.META.get("CF-Connecting-IP"),
-        },
-        timeout=5,
-    )
+    resp = requests.post(TURNSTILE_VERIFY_URL, data=turnstile_data(request), timeout=5)
     result = resp.json()
     return bool(result.get("success"))
+
+
+async def averify_turnstile_token(request: HttpRequest) -> bool:
+    """
+    The async counterpart of verify_turnstile_token, it does not hold a thread while it waits.
+    """
+    logger.info("Verify Turnstile token")
+    data = {key: value for key, value in turnstile_data(request).items() if value is not None}
+    timeout = aiohttp.ClientTimeout(total=5)
+    async with get_http_session().post(TURNSTILE_VERIFY_URL, data=data, timeout=timeout) as resp:
+        result = await resp.json(content_type=None)
+    return bool(result.get("success"))
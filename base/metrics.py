@@ -0,0 +1,55 @@
+"""Per-process counters, gauges and timers for monitoring."""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+_lock = threading.Lock()
+_counters: dict[str, int] = {}
+_gauges: dict[str, float] = {}
+_timers: dict[str, dict[str, float]] = {}
+
+
+def incr(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, seconds: float) -> None:
+    with _lock:
+        timer = _timers.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        timer["count"] += 1
+        timer["total"] += seconds
+        timer["max"] = max(timer["max"], seconds)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - start)
+
+
+def snapshot() -> dict[str, dict]:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timers": {name: dict(timer) for name, timer in _timers.items()},
+        }
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timers.clear()
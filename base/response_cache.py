@@ -0,0 +1,191 @@
+"""A cache of whole responses for read-only endpoints, kept until the data they were built from changes."""
+
+import functools
+import hashlib
+import json
+from collections.abc import AsyncIterator
+from collections.abc import Callable
+from collections.abc import Iterator
+from inspect import iscoroutinefunction
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import BaseCache
+from django.core.cache import caches
+from django.http import HttpRequest
+from django.http import HttpResponse
+from django.utils import timezone
+
+from base import metrics
+from cla.models import DataVersion
+
+
+class Entry(NamedTuple):
+    # the versions of the counters of the view when the entry was last known to be current
+    versions: list[int]
+    # the counters of the data the response was built from, and their versions
+    tags: tuple[str, ...]
+    tag_versions: list[int]
+    status: int
+    content_type: str | None
+    content: bytes
+
+
+def get_cache() -> BaseCache | None:
+    return caches[settings.LEGACY_API_CACHE] if settings.LEGACY_API_CACHE else None
+
+
+def depends_on(request: HttpRequest, *names: str) -> None:
+    """
+    Name the DataVersion counters of the data the response to the request is built from, finer than the
+    counters of its view, so changes of other people or groups keep it cached.
+    """
+    request.cache_tags = (*getattr(request, "cache_tags", ()), *names)
+
+
+def _snapshot(request: HttpRequest, names: tuple[str, ...]) -> list[int] | None:
+    # the versions the ETag of the response was made of, see api.legacy_api_views.data_etag
+    versions = getattr(request, "data_versions", {})
+    return [versions[name] for name in names] if all(name in versions for name in names) else None
+
+
+def _key(view: Callable, args: tuple, kwargs: dict) -> str:
+    arguments = hashlib.sha256(json.dumps([args, kwargs], sort_keys=True).encode()).hexdigest()
+    return f"response-cache:{view.__module__}.{view.__name__}:{arguments}:{timezone.now().date()}"
+
+
+def _entry(
+    names: tuple[str, ...],
+    versions: list[int],
+    tags: tuple[str, ...],
+    current: list[int],
+    response: HttpResponse,
+    content: bytes,
+) -> Entry | None:
+    # the versions of the counters and the tags read after the view name the data it read only when none
+    # of the counters has moved since the versions read before it
+    if current[: len(names)] != versions:
+        return None
+    return Entry(versions, tags, current[len(names) :], response.status_code, response.get("Content-Type"), content)
+
+
+def _collect(content: Iterator[bytes], store: Callable[[bytes], None]) -> Iterator[bytes]:
+    # a streamed response is cached as it is sent, unless it grows too large to be kept in memory
+    chunks: list[bytes] | None = []
+    size = 0
+    for chunk in content:
+        if chunks is not None:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > settings.LEGACY_API_CACHE_MAX_SIZE:
+                chunks = None
+        yield chunk
+    if chunks is not None:
+        store(b"".join(chunks))
+
+
+async def _acollect(content: AsyncIterator[bytes], store: Callable) -> AsyncIterator[bytes]:
+    chunks: list[bytes] | None = []
+    size = 0
+    async for chunk in content:
+        if chunks is not None:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > settings.LEGACY_API_CACHE_MAX_SIZE:
+                chunks = None
+        yield chunk
+    if chunks is not None:
+        await store(b"".join(chunks))
+
+
+def cached_response(*names: str) -> Callable:
+    """
+    Cache the responses of a view until the data they were built from changes: the data named by the
+    DataVersion counters the view calls depends_on with, or by the named counters otherwise.
+
+    While none of the named counters has been bumped a cached response is served as it is. Otherwise
+    the counters of its data are read and compared, so a change of one person or group only drops the
+    responses built from it.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        if iscoroutinefunction(view):
+
+            async def aget(cache: BaseCache, key: str, versions: list[int]) -> HttpResponse | None:
+                if (entry := await cache.aget(key)) is None:
+                    return None
+                if entry.versions != versions:
+                    if await DataVersion.aget_many(*entry.tags) != entry.tag_versions:
+                        return None
+                    await cache.aset(key, entry._replace(versions=versions))
+                return HttpResponse(entry.content, status=entry.status, content_type=entry.content_type)
+
+            @functools.wraps(view)
+            async def async_wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+                if (cache := get_cache()) is None:
+                    return await view(request, *args, **kwargs)
+                if (versions := _snapshot(request, names)) is None:
+                    versions = await DataVersion.aget_many(*names)
+                key = _key(view, args, kwargs)
+                if (cached := await aget(cache, key, versions)) is not None:
+                    metrics.incr("response_cache.hits")
+                    return cached
+                metrics.incr("response_cache.misses")
+                response = await view(request, *args, **kwargs)
+
+                async def store(content: bytes) -> None:
+                    if len(content) > settings.LEGACY_API_CACHE_MAX_SIZE:
+                        return
+                    tags = getattr(request, "cache_tags", names)
+                    current = await DataVersion.aget_many(*names, *tags)
+                    if (entry := _entry(names, versions, tags, current, response, content)) is not None:
+                        await cache.aset(key, entry)
+
+                if response.streaming:
+                    response.streaming_content = _acollect(response.streaming_content, store)
+                else:
+                    await store(response.content)
+                return response
+
+            return async_wrapper
+
+        def get(cache: BaseCache, key: str, versions: list[int]) -> HttpResponse | None:
+            if (entry := cache.get(key)) is None:
+                return None
+            if entry.versions != versions:
+                if DataVersion.get_many(*entry.tags) != entry.tag_versions:
+                    return None
+                # the data of the response has not changed, it is served as it is until the next change
+                cache.set(key, entry._replace(versions=versions))
+            return HttpResponse(entry.content, status=entry.status, content_type=entry.content_type)
+
+        @functools.wraps(view)
+        def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if (cache := get_cache()) is None:
+                return view(request, *args, **kwargs)
+            if (versions := _snapshot(request, names)) is None:
+                versions = DataVersion.get_many(*names)
+            key = _key(view, args, kwargs)
+            if (cached := get(cache, key, versions)) is not None:
+                metrics.incr("response_cache.hits")
+                return cached
+            metrics.incr("response_cache.misses")
+            response = view(request, *args, **kwargs)
+
+            def store(content: bytes) -> None:
+                if len(content) > settings.LEGACY_API_CACHE_MAX_SIZE:
+                    return
+                tags = getattr(request, "cache_tags", names)
+                current = DataVersion.get_many(*names, *tags)
+                if (entry := _entry(names, versions, tags, current, response, content)) is not None:
+                    cache.set(key, entry)
+
+            if response.streaming:
+                response.streaming_content = _collect(response.streaming_content, store)
+            else:
+                store(response.content)
+            return response
+
+        return wrapper
+
+    return decorator
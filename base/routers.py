@@ -0,0 +1,138 @@
+"""Routing of read-only traffic to the read replicas listed in DATABASE_REPLICAS."""
+
+import functools
+import logging
+import random
+import time
+from collections.abc import AsyncIterator
+from collections.abc import Callable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest
+from django.http import HttpResponse
+
+from base import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# the state of the current replica_reads() block: whether it is pinned to the primary, and its replica
+_scope: ContextVar[dict | None] = ContextVar("replica_scope", default=None)
+# monotonic time until which a replica is considered unavailable
+_unavailable_until: dict[str, float] = {}
+
+
+@contextmanager
+def replica_reads() -> Iterator[None]:
+    """
+    Read from a replica within the block. All its reads go to the same replica, and a nested block
+    shares the state of the outer one.
+    """
+    if _scope.get() is not None:
+        yield
+        return
+    token = _scope.set({"pinned": False, "alias": None})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def pin_to_primary() -> None:
+    """
+    Read from the primary for the rest of the current replica_reads() block.
+    """
+    if (scope := _scope.get()) is not None:
+        scope["pinned"] = True
+
+
+def _stream(content: Iterator[bytes]) -> Iterator[bytes]:
+    with replica_reads():
+        yield from content
+
+
+async def _astream(content: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    with replica_reads():
+        async for chunk in content:
+            yield chunk
+
+
+def read_from_replica(view: Callable) -> Callable:
+    """
+    Run a read-only view, and the streaming of its response, within replica_reads().
+    """
+    if iscoroutinefunction(view):
+
+        @functools.wraps(view)
+        async def async_wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            with replica_reads():
+                response = await view(request, *args, **kwargs)
+            if response.streaming:
+                response.streaming_content = _astream(response.streaming_content)
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        with replica_reads():
+            response = view(request, *args, **kwargs)
+        if response.streaming:
+            # the rows of a streamed response are read after the view has returned
+            response.streaming_content = _stream(response.streaming_content)
+        return response
+
+    return wrapper
+
+
+def is_available(alias: str) -> bool:
+    if time.monotonic() < _unavailable_until.get(alias, 0.0):
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except Exception:
+        logger.warning("Read replica %s is unavailable, reading from the primary", alias, exc_info=True)
+        metrics.incr(f"db.replica.{alias}.unavailable")
+        _unavailable_until[alias] = time.monotonic() + settings.DATABASE_REPLICA_RETRY_INTERVAL
+        return False
+    _unavailable_until.pop(alias, None)
+    return True
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints) -> str | None:
+        scope = _scope.get()
+        if scope is None or scope["pinned"] or not settings.DATABASE_REPLICAS:
+            return None
+        if scope["alias"] is None:
+            replicas = list(settings.DATABASE_REPLICAS)
+            random.shuffle(replicas)
+            scope["alias"] = next((alias for alias in replicas if is_available(alias)), None)
+            if scope["alias"] is None:
+                scope["pinned"] = True
+                return None
+        return scope["alias"]
+
+    def db_for_write(self, model, **hints) -> str | None:
+        # the writer must see its own writes, which the replicas may not have received yet
+        pin_to_primary()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool | None:
+        # the replicas hold the same data as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool | None:
+        # the replicas receive the schema from the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -16,6 +16,50 @@ ICLA_WEBHOOK_SECRET_SLUG = ""
 ICLA_SUBMISSION_SUCCESS_URL = ""
 
 GITHUB_API_TOKEN = ""
+# seconds
+GITHUB_API_CONNECT_TIMEOUT = 5
+GITHUB_API_READ_TIMEOUT = 30
+# connections kept alive to api.github.com by every process
+GITHUB_API_POOL_SIZE = 10
+# retries of server errors and secondary rate limits, the delay doubles with every attempt
+GITHUB_API_MAX_RETRIES = 3
+GITHUB_API_BACKOFF_FACTOR = 1.0
+GITHUB_API_MAX_RETRY_DELAY = 60
+# token bucket in front of the GitHub calls of a process: calls per second and burst size
+GITHUB_API_RATE = 1.0
+GITHUB_API_BURST = 30
+# calls allowed to wait for a token, and for how many seconds, before they are refused
+GITHUB_API_MAX_QUEUE = 100
+GITHUB_API_QUEUE_TIMEOUT = 300
+# fetch the commits, labels and CLA check status of a PR with GraphQL instead of REST
+GITHUB_USE_GRAPHQL = False
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# background CLA check queue, see the run_cla_check_worker management command
+CLA_CHECK_WORKERS = 4
+CLA_CHECK_POLL_INTERVAL = 1.0
+CLA_CHECK_MAX_ATTEMPTS = 3
+# seconds, multiplied by the number of the failed attempts
+CLA_CHECK_RETRY_DELAY = 30
+# seconds after which a check left running by a dead worker is run again
+CLA_CHECK_TIMEOUT = 300
+# seconds between the metrics reports of the worker
+CLA_CHECK_METRICS_LOG_INTERVAL = 60
+# seconds a PR must stay quiet before it is checked, events arriving meanwhile are coalesced
+CLA_CHECK_QUIET_WINDOW = 5
+
+# resolve the identifiers of the legacy API from an in-process index instead of the DB
+PERSONNEL_IDENTITY_INDEX = False
+# how often, in seconds, a process checks whether another one has changed the personnel data
+PERSONNEL_IDENTITY_INDEX_CHECK_INTERVAL = 5
+# the alias of the cache keeping the responses of the legacy API, see base.response_cache
+LEGACY_API_CACHE = ""
+# bytes, larger responses are not cached
+LEGACY_API_CACHE_MAX_SIZE = 10 * 1024 * 1024
+# identifiers accepted by a single batch request of the legacy API
+LEGACY_API_BATCH_LIMIT = 1000
+# serve the async variants of the legacy API and form views, for deployments under an ASGI server
+ASYNC_VIEWS = False
 
 STATIC_ROOT = BASE_DIR / "static"
 MEDIA_ROOT = BASE_DIR / "media"
@@ -33,6 +77,7 @@ CONTACT_FORM_RECIPIENTS = ""
 CONTACT_FORM_SUBMISSION_SUCCESS_URL = ""
 
 ADMIN_SECRET_SLUG = ""
+METRICS_SECRET_SLUG = ""
 ADMIN_SITE_HEADER = ""
 ADMIN_SITE_TITLE = ""
 ADMIN_SITE_INDEX_TITLE = ""
@@ -101,6 +146,26 @@ DATABASES = {
     }
 }
 
+# aliases in DATABASES of the read replicas of the default database, used by the read-only views
+DATABASE_REPLICAS: list[str] = []
+# seconds a replica that cannot be connected to is left out before it is tried again
+DATABASE_REPLICA_RETRY_INTERVAL = 30
+DATABASE_ROUTERS = ["base.routers.ReplicaRouter"]
+
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # evicts the least recently used responses beyond MAX_ENTRIES, and every response after TIMEOUT
+    "legacy_api": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "legacy-api",
+        "TIMEOUT": 3600,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,273 @@
+import asyncio
+import json
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db import connections
+from django.db import DatabaseError
+from django.test import Client
+from django.test import RequestFactory
+from django.urls import reverse
+from pymysql.err import OperationalError
+from pytest_mock import MockerFixture
+
+from api.cla_check import get_verdicts
+from api.models import CommitVerdict
+from base import common
+from base import metrics
+from base import routers
+from base.cloudsql_mysql import base as cloudsql
+from base.cloudsql_mysql.pool import ConnectionPool
+from cla.models import DataVersion
+from cla.models import ICLA
+
+
+SETTINGS_DICT: dict[str, Any] = {
+    "NAME": "cla",
+    "USER": "cla-user",
+    "PASSWORD": "",
+    "HOST": "",
+    "PORT": "",
+    "OPTIONS": {"instance_connection_name": "project:region:instance"},
+}
+
+
+@pytest.fixture()
+def connector_cls(mocker: MockerFixture):
+    cloudsql.close_connectors()
+    yield mocker.patch.object(cloudsql, "Connector")
+    cloudsql.close_connectors()
+
+
+def _wrapper(**options) -> cloudsql.DatabaseWrapper:
+    settings_dict = SETTINGS_DICT | {"OPTIONS": SETTINGS_DICT["OPTIONS"] | options}
+    return cloudsql.DatabaseWrapper(settings_dict, alias="cloudsql")
+
+
+def test_connector_is_shared_by_connections_with_the_same_options(connector_cls):
+    metrics.reset()
+    first = _wrapper()
+    second = _wrapper()
+
+    first.get_new_connection(first.get_connection_params())
+    second.get_new_connection(second.get_connection_params())
+    _wrapper(ip_type="private").get_new_connection(first.get_connection_params())
+
+    assert connector_cls.call_count == 2
+    connector_cls.assert_any_call(ip_type="public", enable_iam_auth=False, refresh_strategy="background")
+    connector_cls.assert_any_call(ip_type="private", enable_iam_auth=False, refresh_strategy="background")
+    assert connector_cls.return_value.connect.call_count == 3
+    assert metrics.snapshot()["timers"]["db.connect"]["count"] == 3
+
+
+def test_connectors_are_closed_at_exit(connector_cls):
+    connector = cloudsql.get_connector("public", False, "background")
+
+    cloudsql.close_connectors()
+
+    connector.close.assert_called_once_with()
+    assert cloudsql.get_connector("public", False, "background") is connector_cls.return_value
+    assert connector_cls.call_count == 2
+
+
+def test_forked_process_gets_its_own_connector(connector_cls, mocker: MockerFixture):
+    cloudsql.get_connector("public", False, "background")
+    mocker.patch.object(cloudsql.os, "getpid", return_value=-1)
+
+    cloudsql.get_connector("public", False, "background")
+
+    assert connector_cls.call_count == 2
+
+
+def _pool(mocker: MockerFixture, **options) -> tuple[ConnectionPool, MagicMock]:
+    connect = mocker.MagicMock(side_effect=lambda: mocker.MagicMock())
+    return ConnectionPool(connect, name="test", **options), connect
+
+
+def test_pool_reuses_returned_connections(mocker: MockerFixture):
+    metrics.reset()
+    pool, connect = _pool(mocker)
+
+    first = pool.acquire()
+    raw = first._connection
+    first.close()
+    second = pool.acquire()
+
+    assert second._connection is raw
+    assert connect.call_count == 1
+    # the transaction of the first borrower is rolled back, the connection is pinged before reuse
+    raw.rollback.assert_called_once_with()
+    raw.ping.assert_called_once_with(reconnect=False)
+    assert metrics.snapshot()["timers"]["db.pool.test.wait"]["count"] == 2
+
+
+def test_pool_waits_for_a_free_connection_up_to_the_timeout(mocker: MockerFixture):
+    metrics.reset()
+    pool, connect = _pool(mocker, max_size=1, timeout=0.01)
+    pool.acquire()
+
+    with pytest.raises(OperationalError):
+        pool.acquire()
+
+    assert connect.call_count == 1
+    assert metrics.snapshot()["counters"]["db.pool.test.timeouts"] == 1
+
+
+def test_pool_replaces_broken_and_old_connections(mocker: MockerFixture):
+    pool, connect = _pool(mocker, max_lifetime=60)
+    broken = pool.acquire()
+    broken._connection.ping.side_effect = OperationalError("gone away")
+    broken.close()
+
+    replacement = pool.acquire()
+    assert connect.call_count == 2
+    assert pool.size == 1
+
+    replacement.created_at -= 61
+    replacement.close()
+    assert pool.size == 0 and not pool.idle
+
+
+def test_pool_closes_idle_connections_beyond_min_size(mocker: MockerFixture):
+    pool, connect = _pool(mocker, min_size=1, max_idle=0)
+    first, second = pool.acquire(), pool.acquire()
+    first.close()
+    second.close()
+
+    pool.acquire()
+
+    assert pool.size == 1
+    assert connect.call_count == 2
+
+
+def test_pool_opens_min_size_connections_on_first_use(mocker: MockerFixture):
+    pool, connect = _pool(mocker, min_size=3)
+    assert connect.call_count == 0
+
+    first = pool.acquire()
+
+    assert connect.call_count == 3
+    assert (pool.size, len(pool.idle)) == (3, 2)
+    first.close()
+    pool.acquire()
+    assert connect.call_count == 3
+
+
+def test_pool_closes_idle_connections_when_they_are_returned(mocker: MockerFixture):
+    pool, _ = _pool(mocker, max_idle=0)
+    first, second = pool.acquire(), pool.acquire()
+    raw = first._connection
+    first.close()
+
+    second.close()
+
+    assert pool.size == 1
+    raw.close.assert_called_once_with()
+
+
+def test_database_wrapper_borrows_from_the_pool(connector_cls):
+    wrapper = _wrapper(pool={"max_size": 2})
+    cloudsql.close_pools()
+
+    wrapper.get_new_connection(wrapper.get_connection_params()).close()
+    wrapper.get_new_connection(wrapper.get_connection_params())
+
+    assert connector_cls.return_value.connect.call_count == 1
+    cloudsql.close_pools()
+
+
+@pytest.fixture()
+def replica(db, settings, tmp_path, django_db_blocker):
+    # a second SQLite database standing for a read replica of the test database
+    connections.settings["replica"] = connections["default"].settings_dict | {"NAME": str(tmp_path / "replica.db")}
+    with django_db_blocker.unblock():
+        call_command("migrate", database="replica", verbosity=0)
+    settings.DATABASE_REPLICAS = ["replica"]
+    routers._unavailable_until.clear()
+    yield "replica"
+    connections["replica"].close()
+    del connections["replica"]
+    del connections.settings["replica"]
+    routers._unavailable_until.clear()
+
+
+def test_legacy_api_reads_from_the_replica(client: Client, replica: str):
+    ICLA.objects.create(email="primary@example.org", cla_pdf="ICLA/primary.pdf")
+    ICLA.objects.using(replica).create(email="replica@example.org", cla_pdf="ICLA/replica.pdf")
+
+    assert client.get(reverse("0-hascla-email", args=("replica@example.org",))).status_code == 200
+    assert client.get(reverse("0-hascla-email", args=("primary@example.org",))).status_code == 204
+    # streamed responses are read from the replica as well
+    assert json.loads(client.get(reverse("0-clas")).getvalue()) == ["replica@example.org"]
+    # other reads go to the primary
+    assert list(ICLA.objects.values_list("email", flat=True)) == ["primary@example.org"]
+
+
+def test_write_pins_reads_to_the_primary(replica: str):
+    with routers.replica_reads():
+        assert ICLA.objects.all().db == replica
+        with routers.replica_reads():
+            ICLA.objects.create(email="new@example.org", cla_pdf="ICLA/new.pdf")
+        assert ICLA.objects.all().db == "default"
+    with routers.replica_reads():
+        assert ICLA.objects.all().db == replica
+
+
+def test_migrations_are_not_run_on_the_replicas(replica: str):
+    router = routers.ReplicaRouter()
+
+    assert router.allow_migrate(replica, "cla") is False
+    assert router.allow_migrate("default", "cla") is None
+
+
+def test_unavailable_replica_falls_back_to_the_primary(client: Client, replica: str, mocker: MockerFixture):
+    ICLA.objects.create(email="primary@example.org", cla_pdf="ICLA/primary.pdf")
+    ensure_connection = mocker.patch.object(
+        connections[replica], "ensure_connection", side_effect=DatabaseError("unreachable")
+    )
+    url = reverse("0-hascla-email", args=("primary@example.org",))
+
+    assert client.get(url).status_code == 200
+    assert client.get(url).status_code == 200
+    # the replica is not tried again until the retry interval has passed
+    assert ensure_connection.call_count == 1
+    assert metrics.snapshot()["counters"]["db.replica.replica.unavailable"] == 1
+
+
+def test_cla_check_reads_from_an_up_to_date_replica(replica: str):
+    ICLA.objects.using(replica).create(email="replica@example.org", cla_pdf="ICLA/replica.pdf")
+    commits = [{"sha": "abc", "commit": {"author": {"email": "replica@example.org"}, "message": "Fix"}}]
+
+    # the replica has not received the latest CLA version yet, the primary is read instead
+    assert [verdict.has_cla for verdict in get_verdicts(commits)] == [False]
+
+    CommitVerdict.objects.all().delete()
+    DataVersion.objects.using(replica).create(name=DataVersion.CLA, version=DataVersion.get(DataVersion.CLA))
+    assert [verdict.has_cla for verdict in get_verdicts(commits)] == [True]
+
+
+def test_async_turnstile_verification(mocker: MockerFixture, rf: RequestFactory, settings):
+    settings.CLOUDFLARE_TURNSTILE_SECRET_KEY = "secret"
+    session = mocker.MagicMock()
+    session.post.return_value.__aenter__.return_value.json = mocker.AsyncMock(return_value={"success": True})
+    mocker.patch("base.common.get_http_session", return_value=session)
+
+    assert async_to_sync(common.averify_turnstile_token)(rf.post("/", {"cf-turnstile-response": "token"}))
+    # the missing client address is left out, as requests does
+    assert session.post.call_args.kwargs["data"] == {"secret": "secret", "response": "token"}
+
+
+def test_http_session_is_shared_within_an_event_loop():
+    async def sessions() -> tuple:
+        first, second = common.get_http_session(), common.get_http_session()
+        await first.close()
+        replacement = common.get_http_session()
+        await replacement.close()
+        return first, second, replacement
+
+    first, second, replacement = asyncio.run(sessions())
+    assert first is second
+    assert replacement is not first
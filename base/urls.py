@@ -1,19 +1,16 @@
+from types import ModuleType
+
 from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 
-from api.legacy_api_views import find_person
-from api.legacy_api_views import get_email_cla
-from api.legacy_api_views import get_group_members
-from api.legacy_api_views import get_group_members_cla
-from api.legacy_api_views import get_list_clas
-from api.legacy_api_views import get_person_cla
-from api.legacy_api_views import get_person_membership
-from api.legacy_api_views import get_person_tag
-from api.legacy_api_views import is_person_in_group
-from api.legacy_api_views import list_people
+from api import legacy_api_async_views
+from api import legacy_api_views
+from api.views import asend_message_from_contact_form
+from api.views import get_metrics
 from api.views import handle_github_pull_request_webhook
 from api.views import send_message_from_contact_form
+from cla.views import asend_icla_signing_request
 from cla.views import get_ccla_pdf
 from cla.views import get_icla_pdf
 from cla.views import handle_ccla_submission_completed_webhook
@@ -21,9 +18,21 @@ from cla.views import handle_icla_submission_completed_webhook
 from cla.views import send_icla_signing_request
 
 
+# the async views do not hold a thread while they wait for the database or a slow remote service
+legacy_api: ModuleType
+if settings.ASYNC_VIEWS:
+    legacy_api = legacy_api_async_views
+    contact_form_view = asend_message_from_contact_form
+    icla_signing_view = asend_icla_signing_request
+else:
+    legacy_api = legacy_api_views
+    contact_form_view = send_message_from_contact_form
+    icla_signing_view = send_icla_signing_request
+
+
 urlpatterns = [
-    path("contact/submit/", send_message_from_contact_form, name="contact-submit"),
-    path("icla/submit/", send_icla_signing_request, name="icla-submit"),
+    path("contact/submit/", contact_form_view, name="contact-submit"),
+    path("icla/submit/", icla_signing_view, name="icla-submit"),
     path(
         f"webhooks/ccla/{settings.CCLA_WEBHOOK_SECRET_SLUG}/",
         handle_ccla_submission_completed_webhook,
@@ -42,15 +51,20 @@ urlpatterns = [
         handle_github_pull_request_webhook,
         name="webhooks-icla-check",
     ),
+    path(f"metrics/{settings.METRICS_SECRET_SLUG}/", get_metrics, name="metrics"),
     # legacy API
-    path("0/People", list_people, name="0-people"),
-    path("0/Person/<str:id>", find_person, name="0-person-id"),
-    path("0/Person/<str:id>/Membership", get_person_membership, name="0-person-id-membership"),
-    path("0/Person/<str:id>/IsMemberOf/<str:group>", is_person_in_group, name="0-person-id-ismemberof-group"),
-    path("0/Person/<str:id>/ValueOfTag/<str:tag>", get_person_tag, name="0-person-id-valueoftag-tag"),
-    path("0/Person/<str:id>/HasCLA", get_person_cla, name="0-person-id-hascla"),
-    path("0/Group/<str:group>/Members", get_group_members, name="0-group-group-members"),
-    path("0/Group/<str:group>/CLAs", get_group_members_cla, name="0-group-group-clas"),
-    path("0/HasCLA/<str:email>", get_email_cla, name="0-hascla-email"),
-    path("0/CLAs", get_list_clas, name="0-clas"),
+    path("0/People", legacy_api.list_people, name="0-people"),
+    path("0/Person", legacy_api.find_people, name="0-person"),
+    path("0/Person/<str:id>", legacy_api.find_person, name="0-person-id"),
+    path("0/Person/<str:id>/Membership", legacy_api.get_person_membership, name="0-person-id-membership"),
+    path(
+        "0/Person/<str:id>/IsMemberOf/<str:group>", legacy_api.is_person_in_group, name="0-person-id-ismemberof-group"
+    ),
+    path("0/Person/<str:id>/ValueOfTag/<str:tag>", legacy_api.get_person_tag, name="0-person-id-valueoftag-tag"),
+    path("0/Person/<str:id>/HasCLA", legacy_api.get_person_cla, name="0-person-id-hascla"),
+    path("0/Group/<str:group>/Members", legacy_api.get_group_members, name="0-group-group-members"),
+    path("0/Group/<str:group>/CLAs", legacy_api.get_group_members_cla, name="0-group-group-clas"),
+    path("0/HasCLA", legacy_api.get_emails_cla, name="0-hascla"),
+    path("0/HasCLA/<str:email>", legacy_api.get_email_cla, name="0-hascla-email"),
+    path("0/CLAs", legacy_api.get_list_clas, name="0-clas"),
 ]
@@ -5,3 +5,6 @@ class ClaConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "cla"
     verbose_name = "CLA"
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_email_key(apps, schema_editor):
+    ICLA = apps.get_model('cla', 'ICLA')
+    batch = []
+    for icla in ICLA.objects.only('email').iterator(chunk_size=BATCH_SIZE):
+        icla.email_key = icla.email.strip().lower()
+        batch.append(icla)
+        if len(batch) == BATCH_SIZE:
+            ICLA.objects.bulk_update(batch, ['email_key'])
+            batch = []
+    ICLA.objects.bulk_update(batch, ['email_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cla', '0007_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='icla',
+            name='email_key',
+            field=models.EmailField(db_index=True, default='', editable=False, max_length=254),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_email_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:40
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def backfill_is_active(apps, schema_editor):
+    ICLA = apps.get_model('cla', 'ICLA')
+    active = ~Q(cla_pdf='') & (Q(ccla__isnull=True, _is_volunteer=True) | Q(in_schedule_a=True))
+    ICLA.objects.filter(active).update(_is_active=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cla', '0008_icla_email_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='icla',
+            name='_is_active',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Is active'),
+        ),
+        migrations.RunPython(backfill_is_active, migrations.RunPython.noop),
+    ]
@@ -11,8 +11,12 @@ from django.contrib import admin
 from django.contrib.auth.models import User
 from django.core.mail import send_mail
 from django.db import models
+from django.db.models import F
+from django.db.models import Q
 from docuseal import docuseal
 
+from base.common import normalize_email
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,6 +38,10 @@ def download_document(cla: CCLA | ICLA) -> None:
     path.write_bytes(r.content)
 
 
+# the SQL counterpart of ICLA.is_active
+ACTIVE_ICLA = ~Q(cla_pdf="") & (Q(ccla__isnull=True, _is_volunteer=True) | Q(in_schedule_a=True))
+
+
 class ICLA(models.Model):
     class Meta:
         verbose_name = "ICLA"
@@ -42,12 +50,16 @@ class ICLA(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     cla_pdf = models.FileField("CLA pdf", upload_to=cla_file_name)
     email = models.EmailField(unique=True, db_index=True)
+    # the lowercased email, every lookup by email goes through it
+    email_key = models.EmailField(db_index=True, editable=False)
     full_name = models.CharField(max_length=255)
     public_name = models.CharField(blank=True, max_length=255)
     mailing_address = models.CharField(blank=True, max_length=255)
     country = models.CharField(blank=True, max_length=255)
     telephone = models.CharField(blank=True, max_length=255)
     _is_volunteer = models.BooleanField(default=True, verbose_name="Is volunteer")
+    # is_active stored on save, so the active ICLAs can be selected in SQL
+    _is_active = models.BooleanField(default=False, db_index=True, editable=False, verbose_name="Is active")
     docuseal_submission_id = models.IntegerField(blank=True, null=True)
     in_schedule_a = models.BooleanField(default=False, verbose_name="In Schedule A")
     point_of_contact = models.EmailField(blank=True)
@@ -93,12 +105,27 @@ class ICLA(models.Model):
         if not self.cla_pdf and self.docuseal_submission_id:
             download_document(self)
             self.cla_pdf = cla_file_name(self)
+        self.email_key = normalize_email(self.email)
+        self._is_active = self.is_active
+        if (update_fields := kwargs.get("update_fields")) is not None:
+            kwargs["update_fields"] = {*update_fields, "_is_active"}
+            if "email" in update_fields:
+                kwargs["update_fields"].add("email_key")
         super().save(**kwargs)
 
+    @classmethod
+    def update_is_active(cls, pks: list) -> None:
+        """
+        Store is_active of ICLAs changed without a save of their own, e.g. detached from a deleted CCLA.
+        """
+        iclas = cls.objects.filter(pk__in=pks)
+        iclas.filter(ACTIVE_ICLA).update(_is_active=True)
+        iclas.exclude(ACTIVE_ICLA).update(_is_active=False)
+
     @property
     @admin.display(boolean=True)
     def is_volunteer(self) -> bool:
-        return not bool(self.ccla) and bool(self._is_volunteer)
+        return self.ccla_id is None and bool(self._is_volunteer)
 
     @property
     @admin.display(boolean=True)
@@ -176,3 +203,54 @@ class CCLAAttachment(models.Model):
 
     def __str__(self) -> str:
         return Path(self.file.name).name
+
+
+class DataVersion(models.Model):
+    """
+    A counter bumped on every change of a data set, or of a single person or group, so whatever is
+    derived from the data can tell whether it is stale.
+    """
+
+    CLA = "cla"
+    PERSONNEL = "personnel"
+    # which person every identifier resolves to, and which group every name
+    IDENTIFIERS = "identifiers"
+    GROUPS = "groups"
+
+    name = models.CharField(primary_key=True, max_length=64)
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def get(cls, name: str) -> int:
+        return cls.objects.filter(name=name).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def get_many(cls, *names: str) -> list[int]:
+        versions = dict(cls.objects.filter(name__in=names).values_list("name", "version"))
+        return [versions.get(name, 0) for name in names]
+
+    @classmethod
+    async def aget_many(cls, *names: str) -> list[int]:
+        rows = cls.objects.filter(name__in=names).values_list("name", "version")
+        versions = {name: version async for name, version in rows}
+        return [versions.get(name, 0) for name in names]
+
+    @staticmethod
+    def of_person(pk: object) -> str:
+        return f"person:{pk}"
+
+    @staticmethod
+    def of_group(pk: object) -> str:
+        return f"group:{pk}"
+
+    @classmethod
+    def bump(cls, *names: str) -> None:
+        existing = set(cls.objects.filter(name__in=names).values_list("name", flat=True))
+        cls.objects.filter(name__in=existing).update(version=F("version") + 1)
+        for name in set(names) - existing:
+            _, created = cls.objects.get_or_create(name=name, defaults={"version": 1})
+            if not created:
+                cls.objects.filter(name=name).update(version=F("version") + 1)
+
+    def __str__(self) -> str:
+        return f"{self.name} v{self.version}"
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from .models import CCLA
+from .models import DataVersion
+from .models import ICLA
+from personnel.models import Person
+
+
+@receiver(pre_save, sender=ICLA)
+def remember_icla_person(sender, instance: ICLA, using: str, **kwargs) -> None:
+    # the person before the save, whose CLAs change as well when the ICLA moves to another one
+    previous = ICLA.objects.using(using).filter(pk=instance.pk).values_list("person", flat=True)
+    instance._previous_person_id = previous.first()
+
+
+@receiver(post_save, sender=ICLA)
+@receiver(post_delete, sender=ICLA)
+def bump_icla_versions(sender, instance: ICLA, **kwargs) -> None:
+    people = {instance.person_id, getattr(instance, "_previous_person_id", None)} - {None}
+    DataVersion.bump(DataVersion.CLA, *Person.version_names(people))
+
+
+@receiver(post_save, sender=CCLA)
+@receiver(post_delete, sender=CCLA)
+def bump_cla_version(sender, instance: CCLA, **kwargs) -> None:
+    DataVersion.bump(DataVersion.CLA, *Person.version_names(getattr(instance, "_icla_people", ())))
+
+
+@receiver(pre_delete, sender=CCLA)
+def remember_ccla_iclas(sender, instance: CCLA, **kwargs) -> None:
+    # the ICLAs of a deleted CCLA are detached from it by SET_NULL without a save of their own
+    iclas = list(instance.icla_set.values_list("pk", "person"))
+    instance._icla_pks = [pk for pk, _ in iclas]
+    instance._icla_people = {person for _, person in iclas if person is not None}
+
+
+@receiver(post_delete, sender=CCLA)
+def update_detached_iclas(sender, instance: CCLA, **kwargs) -> None:
+    if pks := getattr(instance, "_icla_pks", None):
+        ICLA.update_is_active(pks)
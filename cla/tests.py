@@ -5,14 +5,18 @@ from datetime import timezone
 from pathlib import Path
 
 import pytest
+from asgiref.sync import async_to_sync
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.test import Client
+from django.test import RequestFactory
 from django.urls import reverse
 from pytest_mock import MockerFixture
 
 from cla.models import CCLA
+from cla.models import DataVersion
 from cla.models import ICLA
+from cla.views import asend_icla_signing_request
 
 
 FIXED_NOW = datetime(2025, 6, 25, 13, 45, 31, 892000, tzinfo=timezone.utc)
@@ -263,6 +267,47 @@ def test_handle_icla_submission_completed_webhook_empty_mailing_address2(mocker:
     assert icla.country == "USA"
 
 
+def _icla_submission(email: str) -> dict:
+    values = {
+        "Full Name": "Test User",
+        "Public Name": None,
+        "Mailing Address 1": "123 Test St",
+        "Mailing Address 2": "",
+        "Country": "USA",
+        "Telephone": "",
+        "Email": email,
+    }
+    submitter = {
+        "email": email,
+        "completed_at": "2025-06-25T13:45:31.892Z",
+        "values": [{"field": field, "value": value} for field, value in values.items()],
+    }
+    return {"event_type": "submission.completed", "data": {"id": 2339641, "submitters": [submitter]}}
+
+
+@pytest.mark.django_db
+def test_handle_icla_submission_completed_webhook_with_case_variants(mocker: MockerFixture, client: Client):
+    mocker.patch("cla.models.download_document")
+    ICLA.objects.create(email="Test@Example.com", cla_pdf="ICLA/test.pdf")
+    ICLA.objects.create(email="test@example.com")
+
+    payload = _icla_submission("TEST@example.com")
+    response = client.post(reverse("webhooks-icla"), json.dumps(payload), content_type="application/json")
+
+    assert response.status_code == 200
+    assert ICLA.objects.get(email="test@example.com").full_name == "Test User"
+    assert ICLA.objects.get(email="Test@Example.com").full_name == ""
+
+
+@pytest.mark.django_db
+def test_handle_icla_submission_completed_webhook_unknown_email(client: Client):
+    payload = _icla_submission("nobody@example.com")
+    response = client.post(reverse("webhooks-icla"), json.dumps(payload), content_type="application/json")
+
+    assert response.status_code == 404
+    assert not ICLA.objects.exists()
+
+
 @pytest.mark.django_db
 def test_send_notification_called_only_via_icla_webhook(mocker: MockerFixture, client: Client):
     """
@@ -420,3 +465,68 @@ def test_cla_file_name_helper():
 
     assert cla_file_name(icla_instance) == f"ICLA/{icla_id}.pdf"
     assert cla_file_name(ccla_instance) == f"CCLA/{ccla_id}/{ccla_id}.pdf"
+
+
+@pytest.mark.django_db
+def test_cla_data_version_is_bumped_on_changes():
+    """
+    Saving or deleting an ICLA bumps the version of the CLA data.
+    """
+    start = DataVersion.get(DataVersion.CLA)
+    icla = ICLA.objects.create(email="version@example.com")
+    assert DataVersion.get(DataVersion.CLA) == start + 1
+    icla.delete()
+    assert DataVersion.get(DataVersion.CLA) == start + 2
+
+
+@pytest.mark.django_db
+def test_icla_email_key_is_kept_in_sync():
+    """
+    The lowercased email is stored on create and whenever the email changes.
+    """
+    icla = ICLA.objects.create(email="Some.One@Example.com")
+    assert ICLA.objects.get(email_key="some.one@example.com") == icla
+    icla.email = "Another@Example.com"
+    icla.save(update_fields=["email"])
+    icla.refresh_from_db()
+    assert icla.email_key == "another@example.com"
+
+
+@pytest.mark.django_db
+def test_icla_is_active_is_stored_and_follows_the_ccla():
+    """
+    The stored activity changes with the ICLA and when its CCLA is deleted.
+    """
+    manager = get_user_model().objects.create_user("manager", "manager@example.com")
+    ccla = CCLA.objects.create(corporation_name="Test Corp", ccla_manager=manager)
+    icla = ICLA.objects.create(email="employee@testcorp.com", ccla=ccla, cla_pdf="ICLA/employee.pdf")
+    assert not ICLA.objects.filter(_is_active=True).exists()
+
+    icla.in_schedule_a = True
+    icla.save(update_fields=["in_schedule_a"])
+    assert ICLA.objects.filter(_is_active=True).get() == icla
+
+    icla.in_schedule_a = False
+    icla.save()
+    ccla.delete()
+    # detached from the CCLA, the ICLA is a volunteer one
+    assert ICLA.objects.filter(_is_active=True).get() == icla
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("signed", [False, True], ids=["new-email", "existing-icla"])
+def test_async_send_signing_request_icla(mocker: MockerFixture, rf: RequestFactory, signed: bool):
+    mock_create_submission = mocker.patch("cla.models.docuseal.create_submission")
+    mock_verify_turnstile_token = mocker.patch("cla.views.averify_turnstile_token", return_value=True)
+    email = "New_Contributor@example.com"
+    if signed:
+        ICLA.objects.create(email="new_contributor@example.com")
+    request = rf.post(reverse("icla-submit"), {"email": email, "cf-turnstile-response": "token"})
+
+    response = async_to_sync(asend_icla_signing_request)(request)
+
+    assert response.status_code == 302
+    assert response.url == settings.ICLA_SUBMISSION_SUCCESS_URL
+    mock_verify_turnstile_token.assert_awaited_once_with(request)
+    assert mock_create_submission.called is not signed
+    assert ICLA.objects.count() == 1
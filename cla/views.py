@@ -1,6 +1,7 @@
 import json
 import logging
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
@@ -9,6 +10,7 @@ from django.http import FileResponse
 from django.http import HttpRequest
 from django.http import HttpResponse
 from django.http import HttpResponseBadRequest
+from django.http import HttpResponseNotFound
 from django.http import HttpResponseRedirect
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
@@ -17,6 +19,8 @@ from django.views.decorators.http import require_safe
 from .forms import ICLASigningRequestForm
 from .models import CCLA
 from .models import ICLA
+from base.common import averify_turnstile_token
+from base.common import normalize_email
 from base.common import verify_turnstile_token
 
 logger = logging.getLogger(__name__)
@@ -61,14 +65,41 @@ def send_icla_signing_request(request: HttpRequest) -> HttpResponse:
     email = form.cleaned_data["email"]
     point_of_contact = form.cleaned_data["point_of_contact"]
     is_volunteer = form.cleaned_data.get("is_volunteer", True)
-    try:
-        ICLA.objects.get(email=email)
-    except ICLA.DoesNotExist:
+    if ICLA.objects.filter(email_key=normalize_email(email)).exists():
+        logger.warning("%s has already signed ICLA", email)
+    else:
         icla = ICLA(email=email, point_of_contact=point_of_contact, _is_volunteer=is_volunteer)
         icla.save()
         icla.create_docuseal_submission()
-    else:
+    return HttpResponseRedirect(settings.ICLA_SUBMISSION_SUCCESS_URL)
+
+
+@require_POST
+@csrf_exempt
+async def asend_icla_signing_request(request: HttpRequest) -> HttpResponse:
+    """
+    The async counterpart of send_icla_signing_request.
+    """
+    form = ICLASigningRequestForm(request.POST)
+    if not form.is_valid():
+        logger.warning("Submitted form is not valid")
+        return HttpResponseBadRequest("Submitted form is not valid")
+    if not request.POST.get("cf-turnstile-response"):
+        logger.warning("Missing Turnstile token")
+        return HttpResponseBadRequest("Missing Turnstile token")
+    if not await averify_turnstile_token(request):
+        logger.warning("Turnstile token verification failed")
+        return HttpResponseBadRequest("Turnstile token verification failed")
+    email = form.cleaned_data["email"]
+    point_of_contact = form.cleaned_data["point_of_contact"]
+    is_volunteer = form.cleaned_data.get("is_volunteer", True)
+    if await ICLA.objects.filter(email_key=normalize_email(email)).aexists():
         logger.warning("%s has already signed ICLA", email)
+    else:
+        icla = ICLA(email=email, point_of_contact=point_of_contact, _is_volunteer=is_volunteer)
+        await icla.asave()
+        # the Docuseal call does not touch the database, it does not need to wait for the thread of the ORM
+        await sync_to_async(icla.create_docuseal_submission, thread_sensitive=False)()
     return HttpResponseRedirect(settings.ICLA_SUBMISSION_SUCCESS_URL)
 
 
@@ -125,10 +156,17 @@ def handle_icla_submission_completed_webhook(request: HttpRequest) -> HttpRespon
         msg = "Missing expected fields: %s", ", ".join(diff)
         logger.error(msg)
         return HttpResponseBadRequest(msg)
-    icla = ICLA.objects.get(email=submission_data["Email"].lower())
+    # the same address may have been registered in different cases: the ICLA the lowercased address
+    # is stored under wins, as the address is lowercased below, then an active one
+    email = submission_data["Email"].lower()
+    iclas = ICLA.objects.filter(email_key=normalize_email(email))
+    icla = iclas.filter(email=email).first() or iclas.order_by("-_is_active", "pk").first()
+    if icla is None:
+        logger.error("No ICLA of %s awaits the submission %s", submission_data["Email"], payload["data"]["id"])
+        return HttpResponseNotFound("No ICLA of the submitted email.")
     icla.country = submission_data["Country"]
     icla.docuseal_submission_id = payload["data"]["id"]
-    icla.email = submission_data["Email"].lower()
+    icla.email = email
     icla.full_name = submission_data["Full Name"]
     mailing_address_1 = submission_data["Mailing Address 1"] or ""
     mailing_address_2 = submission_data["Mailing Address 2"] or ""
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PersonnelConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "personnel"
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
@@ -0,0 +1,141 @@
+"""An in-process index of the identifiers people are known by."""
+
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Person
+from base.common import collation_key
+from base.common import iter_chunks
+from base.common import normalize_email
+from cla.models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+
+class IdentityIndex:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # the people with their ids and active memberships, and the keys each of them is indexed by
+        self.people: dict[uuid.UUID, Person] = {}
+        self.keys: dict[uuid.UUID, tuple[set[str], set[str]]] = {}
+        self.ids: defaultdict[str, set[uuid.UUID]] = defaultdict(set)
+        self.emails: defaultdict[str, set[uuid.UUID]] = defaultdict(set)
+        # the version of the personnel data the index holds, None until it is built
+        self.version: int | None = None
+        # the memberships are active as of this date
+        self.built_on: date | None = None
+        self.checked_at = 0.0
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.version = None
+
+    def _add(self, person: Person) -> None:
+        names = [getattr(person, field) for field in Person.ID_FIELDS]
+        names.extend(identity.identity for identity in person.identities.all())
+        ids = {collation_key(name) for name in names if name}
+        emails = {collation_key(normalize_email(email.email)) for email in person.emails.all()}
+        for key in ids:
+            self.ids[key].add(person.pk)
+        for key in emails:
+            self.emails[key].add(person.pk)
+        self.people[person.pk] = person
+        self.keys[person.pk] = (ids, emails)
+
+    def _remove(self, pk: uuid.UUID) -> None:
+        self.people.pop(pk, None)
+        ids, emails = self.keys.pop(pk, (set(), set()))
+        for index, keys in ((self.ids, ids), (self.emails, emails)):
+            for key in keys:
+                index[key].discard(pk)
+                if not index[key]:
+                    del index[key]
+
+    def _build(self) -> None:
+        # the version is read first, so changes made during the build make the index stale
+        version = DataVersion.get(DataVersion.PERSONNEL)
+        self.people, self.keys, self.ids, self.emails = {}, {}, defaultdict(set), defaultdict(set)
+        for chunk in iter_chunks(Person.with_details(Person.objects.all()), "pk"):
+            for person in chunk:
+                self._add(person)
+        self.version, self.built_on = version, timezone.now().date()
+        logger.info("Built the identity index of %s people, version %s", len(self.people), version)
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        stale = self.version is None or self.built_on != timezone.now().date()
+        if not stale and now - self.checked_at < settings.PERSONNEL_IDENTITY_INDEX_CHECK_INTERVAL:
+            return
+        if stale or DataVersion.get(DataVersion.PERSONNEL) != self.version:
+            self._build()
+        self.checked_at = now
+
+    def _lookup(self, id: str) -> set[uuid.UUID]:
+        return self.ids.get(collation_key(id), set()) | self.emails.get(collation_key(normalize_email(id)), set())
+
+    def lookup(self, id: str) -> set[uuid.UUID]:
+        """
+        Return the primary keys of the people known by the identifier, compared the way the database
+        compares it, as Person.find does.
+        """
+        with self.lock:
+            self._refresh()
+            return self._lookup(id)
+
+    def find(self, id: str) -> Person | None:
+        """
+        Person.find answered from the index, with the ids and memberships of the person already fetched.
+        """
+        with self.lock:
+            self._refresh()
+            pks = self._lookup(id)
+            return self.people[next(iter(pks))] if len(pks) == 1 else None
+
+    def update(self, pks: set[uuid.UUID], previous: int, version: int) -> None:
+        """
+        Apply a committed change of the people with the primary keys, which took the personnel data from
+        the previous version to the given one. The index is rebuilt on next use instead when it does not
+        hold the previous version.
+        """
+        if self.version != previous:
+            self.invalidate()
+            return
+        people = list(Person.with_details(Person.objects.filter(pk__in=pks)))
+        with self.lock:
+            if self.version != previous:
+                self.version = None
+                return
+            for pk in pks:
+                self._remove(pk)
+            for person in people:
+                self._add(person)
+            self.version = version
+
+
+identity_index = IdentityIndex()
+
+
+def resolve_person(id: str) -> Person | None:
+    """
+    Person.find, served from the identity index when it is enabled.
+    """
+    if not settings.PERSONNEL_IDENTITY_INDEX:
+        return Person.find(id)
+    return identity_index.find(id) if id else None
+
+
+async def aresolve_person(id: str) -> Person | None:
+    """
+    The async counterpart of resolve_person. A lookup may rebuild the index, it runs in a thread.
+    """
+    if not settings.PERSONNEL_IDENTITY_INDEX:
+        return await Person.afind(id)
+    return await sync_to_async(identity_index.find)(id) if id else None
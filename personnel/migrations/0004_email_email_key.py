@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_email_key(apps, schema_editor):
+    Email = apps.get_model('personnel', 'Email')
+    batch = []
+    for email in Email.objects.only('email').iterator(chunk_size=BATCH_SIZE):
+        email.email_key = email.email.strip().lower()
+        batch.append(email)
+        if len(batch) == BATCH_SIZE:
+            Email.objects.bulk_update(batch, ['email_key'])
+            batch = []
+    Email.objects.bulk_update(batch, ['email_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personnel', '0003_alter_identity_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='email',
+            name='email_key',
+            field=models.EmailField(db_index=True, default='', editable=False, max_length=254),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_email_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personnel', '0004_email_email_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='identity',
+            name='identity',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='nick',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+    ]
@@ -1,34 +1,50 @@
 from __future__ import annotations
 
 import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from collections.abc import Iterable
+from collections.abc import Iterator
 from itertools import chain
 
 from django.db import models
+from django.db.models import aprefetch_related_objects
+from django.db.models import Exists
+from django.db.models import OuterRef
+from django.db.models import Prefetch
 from django.db.models import Q
+from django.db.models import QuerySet
 from django.utils import timezone
 
+from base.common import aiter_chunks
+from base.common import collation_key
+from base.common import iter_chunks
+from base.common import normalize_email
+from cla.models import DataVersion
+from cla.models import ICLA
+
 
 class Group(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
 
+    def has_active_member(self, person: str = "pk") -> Exists:
+        """
+        Tell whether the person referenced by the outer query field is an active member of the group.
+        """
+        return Exists(Membership.objects.filter(Membership.active(), group=self, person=OuterRef(person)))
+
     @property
-    def active_members(self) -> list[Person]:
-        today = timezone.now().date()
-        return self.members.filter(
-            Q(membership__since__isnull=True) | Q(membership__since__lte=today),
-            Q(membership__until__isnull=True) | Q(membership__until__gt=today),
-        ).distinct()
+    def active_members(self) -> QuerySet[Person]:
+        return Person.objects.filter(self.has_active_member())
+
+    @property
+    def active_iclas(self) -> QuerySet[ICLA]:
+        return ICLA.objects.filter(self.has_active_member("person"), _is_active=True)
 
     @property
     def icla_emails(self) -> list[str]:
-        result = []
-        members = [person for person in self.active_members]
-        for member in members:
-            for icla in member.iclas.all():
-                if icla.is_active:
-                    result.append(icla.email)
-        return result
+        return list(self.active_iclas.values_list("email", flat=True))
 
     def __str__(self) -> str:
         return self.name
@@ -39,12 +55,12 @@ class Person(models.Model):
         verbose_name_plural = "Personnel"
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
     country = models.CharField(max_length=255, blank=True)
     joined_at = models.DateField(null=True, blank=True)
     github = models.CharField(unique=True, max_length=255, blank=True, null=True)
     ghe = models.CharField(unique=True, max_length=255, blank=True, null=True, verbose_name="GHE")
-    nick = models.CharField(max_length=255, blank=True)
+    nick = models.CharField(max_length=255, blank=True, db_index=True)
     rev = models.CharField(unique=True, max_length=255, blank=True, null=True)
     pgp = models.CharField(unique=True, max_length=255, blank=True, null=True, verbose_name="PGP")
 
@@ -55,6 +71,9 @@ class Person(models.Model):
         related_name="members",
     )
 
+    # the fields a person is found by, besides the emails and identities
+    ID_FIELDS = ("name", "nick", "ghe", "github")
+
     # here and below are legacy api methods
     @property
     def tags(self) -> dict[str, str]:
@@ -69,8 +88,9 @@ class Person(models.Model):
 
     @property
     def ids(self) -> list[str | dict[str, str]]:
-        emails = self.emails.values_list("email", flat=True)
-        identities = self.identities.values_list("identity", flat=True)
+        # served from the cache when the people come from with_ids()
+        emails = (email.email for email in self.emails.all())
+        identities = (identity.identity for identity in self.identities.all())
         result = list(dict.fromkeys(chain(emails, identities)))
         result.append(self.name)
         if self.nick:
@@ -83,28 +103,141 @@ class Person(models.Model):
 
     @property
     def memberof(self) -> dict[str, str]:
-        today = timezone.now().date()
-        query_filter = (
-            Q(since__isnull=True) | Q(since__lte=today),
-            Q(until__isnull=True) | Q(until__gt=today),
-        )
-        return {m.group.name: str(m.since) for m in self.membership_set.filter(*query_filter)}
+        # served from the cache when the people come from with_details()
+        memberships = getattr(self, "active_memberships", None)
+        if memberships is None:
+            memberships = self.membership_set.filter(Membership.active()).select_related("group")
+        return {m.group.name: str(m.since) for m in memberships}
+
+    @classmethod
+    def id_prefetches(cls) -> list[Prefetch]:
+        return [
+            Prefetch("emails", queryset=Email.objects.only("person", "email").order_by("pk")),
+            Prefetch("identities", queryset=Identity.objects.only("person", "identity").order_by("pk")),
+        ]
+
+    @classmethod
+    def membership_prefetch(cls) -> Prefetch:
+        memberships = Membership.objects.filter(Membership.active()).select_related("group").order_by("pk")
+        return Prefetch("membership_set", queryset=memberships, to_attr="active_memberships")
+
+    @classmethod
+    def detail_prefetches(cls) -> list[Prefetch]:
+        return [*cls.id_prefetches(), cls.membership_prefetch()]
+
+    @classmethod
+    def with_ids(cls, queryset: QuerySet[Person]) -> QuerySet[Person]:
+        """
+        Fetch the emails and identities of all the people along with them, so ids costs no queries.
+        """
+        return queryset.prefetch_related(*cls.id_prefetches())
+
+    @classmethod
+    def with_details(cls, queryset: QuerySet[Person]) -> QuerySet[Person]:
+        """
+        Fetch everything ids and memberof need along with the people.
+        """
+        return queryset.prefetch_related(*cls.detail_prefetches())
 
     @classmethod
-    def list_people(cls) -> list[list[str | dict[str, str]]]:
-        return [person.ids for person in cls.objects.all()]
+    async def afetch_details(cls, people: list[Person]) -> None:
+        """
+        Fetch everything ids and memberof need for people already fetched, the async ORM cannot load
+        them lazily.
+        """
+        await aprefetch_related_objects(people, *cls.detail_prefetches())
+
+    @classmethod
+    def list_people(cls) -> Iterator[list[str | dict[str, str]]]:
+        # three queries per chunk of people, whatever the number of their emails and identities
+        for chunk in iter_chunks(cls.with_ids(cls.objects.all()), "pk"):
+            for person in chunk:
+                yield person.ids
+
+    @classmethod
+    async def alist_people(cls) -> AsyncIterator[list[str | dict[str, str]]]:
+        async for chunk in aiter_chunks(cls.with_ids(cls.objects.all()), "pk"):
+            for person in chunk:
+                yield person.ids
+
+    @staticmethod
+    def find_lookups(id: str) -> tuple[dict[str, str], ...]:
+        return (
+            {"name": id},
+            {"nick": id},
+            {"ghe": id},
+            {"github": id},
+            {"emails__email_key": normalize_email(id)},
+            {"identities__identity": id},
+        )
 
     @classmethod
     def find(cls, id: str) -> Person | None:
+        """
+        Return the only person known by the identifier, None when there is none or more than one.
+
+        Every kind of identifier is looked up through its own index, and the UNION of the lookups
+        deduplicates the people, so two rows at most are read in a single query.
+        """
         if not id:
             return None
-        query_filter = (
-            Q(name=id) | Q(nick=id) | Q(ghe=id) | Q(github=id) | Q(emails__email=id) | Q(identities__identity=id)
-        )
-        queryset = Person.objects.filter(query_filter).distinct()
-        if queryset.count() == 1:
-            return queryset.first()
-        return None
+        first, *rest = (cls.objects.filter(**lookup) for lookup in cls.find_lookups(id))
+        people = list(first.union(*rest)[:2])
+        return people[0] if len(people) == 1 else None
+
+    @classmethod
+    async def afind(cls, id: str) -> Person | None:
+        """
+        The async counterpart of find.
+        """
+        if not id:
+            return None
+        first, *rest = (cls.objects.filter(**lookup) for lookup in cls.find_lookups(id))
+        people = [person async for person in first.union(*rest)[:2]]
+        return people[0] if len(people) == 1 else None
+
+    @classmethod
+    def find_many(cls, ids: list[str]) -> dict[str, list[Person]]:
+        """
+        Return the people known by each of the identifiers, more than one when it is ambiguous.
+
+        The identifiers, and the emails by their key, are matched the way the database compares them, as
+        find does, with a fixed number of queries whatever their number.
+        """
+        matches: defaultdict[str, set[uuid.UUID]] = defaultdict(set)
+        wanted = set(ids)
+        by_collation_key: defaultdict[str, list[str]] = defaultdict(list)
+        for id in wanted:
+            by_collation_key[collation_key(id)].append(id)
+        first, *rest = (cls.objects.filter(**{f"{field}__in": wanted}) for field in cls.ID_FIELDS)
+        for pk, *values in first.union(*rest).values_list("pk", *cls.ID_FIELDS):
+            for value in values:
+                if not value:
+                    continue
+                for id in by_collation_key.get(collation_key(value), []):
+                    matches[id].add(pk)
+        for identity, pk in Identity.objects.filter(identity__in=wanted).values_list("identity", "person"):
+            for id in by_collation_key.get(collation_key(identity), []):
+                matches[id].add(pk)
+        by_email_key: defaultdict[str, list[str]] = defaultdict(list)
+        emails = set()
+        for id in wanted:
+            emails.add(normalize_email(id))
+            by_email_key[collation_key(normalize_email(id))].append(id)
+        for key, pk in Email.objects.filter(email_key__in=emails).values_list("email_key", "person"):
+            for id in by_email_key.get(collation_key(key), []):
+                matches[id].add(pk)
+        people = cls.with_details(cls.objects.filter(pk__in=set().union(*matches.values()))).in_bulk()
+        return {id: [people[pk] for pk in matches[id] if pk in people] for id in ids}
+
+    @staticmethod
+    def version_names(pks: Iterable[uuid.UUID]) -> set[str]:
+        """
+        Return the DataVersion counters of the people and of the groups they are members of, which the
+        responses built from their details depend on.
+        """
+        groups = Membership.objects.filter(person__in=pks).values_list("group", flat=True).distinct()
+        return {*map(DataVersion.of_person, pks), *map(DataVersion.of_group, groups)}
 
     def __str__(self) -> str:
         return self.name
@@ -116,13 +249,21 @@ class Membership(models.Model):
     since = models.DateField(null=True, blank=True)
     until = models.DateField(null=True, blank=True)
 
+    @staticmethod
+    def active() -> Q:
+        """
+        Select the memberships that have started and not ended yet.
+        """
+        today = timezone.now().date()
+        return (Q(since__isnull=True) | Q(since__lte=today)) & (Q(until__isnull=True) | Q(until__gt=today))
+
 
 class Identity(models.Model):
     class Meta:
         verbose_name_plural = "Identities"
 
     person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name="identities")
-    identity = models.CharField(max_length=255)
+    identity = models.CharField(max_length=255, db_index=True)
 
     def __str__(self) -> str:
         return self.identity
@@ -131,6 +272,14 @@ class Identity(models.Model):
 class Email(models.Model):
     person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name="emails")
     email = models.EmailField(unique=True)
+    # the lowercased email, every lookup by email goes through it
+    email_key = models.EmailField(db_index=True, editable=False)
+
+    def save(self, **kwargs) -> None:
+        self.email_key = normalize_email(self.email)
+        if (update_fields := kwargs.get("update_fields")) is not None and "email" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "email_key"}
+        super().save(**kwargs)
 
     def __str__(self) -> str:
         return self.email
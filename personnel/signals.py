@@ -0,0 +1,80 @@
+import functools
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from .index import identity_index
+from .models import Email
+from .models import Group
+from .models import Identity
+from .models import Membership
+from .models import Person
+from cla.models import DataVersion
+
+
+def changed_people(instance, **kwargs) -> set[uuid.UUID]:
+    """
+    Return the primary keys of the people whose ids or memberships a change of the instance affects.
+    """
+    if isinstance(instance, Person):
+        return {instance.pk}
+    if isinstance(instance, Group):
+        if kwargs.get("pk_set") is not None:
+            return set(kwargs["pk_set"])
+        # the members of a saved group, or of a group about to be cleared
+        return set(Membership.objects.filter(group=instance).values_list("person", flat=True))
+    return {instance.person_id}
+
+
+def changed_names(instance, people: set[uuid.UUID], **kwargs) -> set[str]:
+    """
+    Return the DataVersion counters a change of the instance bumps: those of the personnel data, of the
+    people and groups it affects, and of the identifiers and group names when they may have changed.
+    """
+    names = {DataVersion.PERSONNEL, *Person.version_names(people)}
+    if isinstance(instance, Group):
+        names.add(DataVersion.of_group(instance.pk))
+        if "action" not in kwargs:
+            names.add(DataVersion.GROUPS)
+    elif isinstance(instance, Membership):
+        names.add(DataVersion.of_group(instance.group_id))
+    elif "action" in kwargs:
+        names.update(map(DataVersion.of_group, kwargs["pk_set"] or ()))
+    elif isinstance(instance, (Email, Identity)) or kwargs["signal"] is post_delete:
+        names.add(DataVersion.IDENTIFIERS)
+    elif getattr(instance, "_previous_ids", None) != tuple(getattr(instance, field) for field in Person.ID_FIELDS):
+        names.add(DataVersion.IDENTIFIERS)
+    return names
+
+
+@receiver(pre_save, sender=Person)
+def remember_person_ids(sender, instance: Person, using: str, **kwargs) -> None:
+    # the identifiers before the save, to tell whether the people they resolve to may have changed
+    instance._previous_ids = Person.objects.using(using).filter(pk=instance.pk).values_list(*Person.ID_FIELDS).first()
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+@receiver(post_save, sender=Email)
+@receiver(post_delete, sender=Email)
+@receiver(post_save, sender=Identity)
+@receiver(post_delete, sender=Identity)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+@receiver(m2m_changed, sender=Person.groups.through)
+def bump_personnel_version(sender, instance, **kwargs) -> None:
+    people = changed_people(instance, **kwargs)
+    DataVersion.bump(*changed_names(instance, people, **kwargs))
+    if settings.PERSONNEL_IDENTITY_INDEX:
+        # in a transaction the counter stays locked until the commit, so the change took it from version - 1
+        # to version; this process patches its index with it, the others notice the new version and rebuild
+        version = DataVersion.get(DataVersion.PERSONNEL)
+        transaction.on_commit(functools.partial(identity_index.update, people, version - 1, version))